@@ -0,0 +1,94 @@
+STRIP_CHARS = "[]'\" "
+NULL_VALUES = [None, "nan", "", " ", "np.nan", "None"]
+
+
+def default_compare(value, truth, semantic):
+    """
+    Compare a response to the true answer of a question, given the answer's type.
+
+    Same rules as databench_eval's Evaluator.default_compare, kept here so that
+    scoring does not import databench_eval (and with it datasets). pandas is only
+    imported when category answers need to be compared as dates.
+
+    Args:
+        value: The model's answer
+        truth: The true answer
+        semantic (str): One of 'boolean', 'category', 'number', 'list[category]' or 'list[number]'
+
+    Returns:
+        bool: True if the answer is correct
+    """
+    semantic = semantic.strip()
+
+    if str(value).strip(STRIP_CHARS) in NULL_VALUES and str(truth).strip(STRIP_CHARS) in NULL_VALUES:
+        return True
+    if str(value).strip(STRIP_CHARS) in NULL_VALUES or str(truth).strip(STRIP_CHARS) in NULL_VALUES:
+        return False
+
+    if semantic == "boolean":
+        valid_true_values = ['true', 'yes', 'y']
+        valid_false_values = ['false', 'no', 'n']
+        value_str = str(value).strip(STRIP_CHARS).lower()
+        truth_str = str(truth).strip(STRIP_CHARS).lower()
+        return ((value_str in valid_true_values and truth_str in valid_true_values)
+                or (value_str in valid_false_values and truth_str in valid_false_values))
+    elif semantic == "category":
+        value_str = str(value).strip(STRIP_CHARS)
+        truth_str = str(truth).strip(STRIP_CHARS)
+        if value_str == truth_str:
+            return True
+
+        import pandas as pd
+        try:
+            value_date = pd.to_datetime(value_str).date()
+            truth_date = pd.to_datetime(truth_str).date()
+            return value_date == truth_date
+        except (ValueError, TypeError):
+            if not value_str and not truth_str:
+                return True
+            return value_str == truth_str
+    elif semantic == "number":
+        try:
+            value_cleaned = ''.join(char for char in str(value) if char.isdigit() or char in ['.', '-'])
+            truth_cleaned = ''.join(char for char in str(truth) if char.isdigit() or char in ['.', '-'])
+            return round(float(value_cleaned), 2) == round(float(truth_cleaned), 2)
+        except Exception:
+            return False
+    elif semantic == "list[category]":
+        try:
+            value_list = [item.strip(STRIP_CHARS) for item in str(value).strip('[]').split(',')]
+            truth_list = [item.strip(STRIP_CHARS) for item in str(truth).strip('[]').split(',')]
+            value_list = [v if v not in NULL_VALUES else "" for v in value_list]
+            truth_list = [t if t not in NULL_VALUES else "" for t in truth_list]
+            if len(value_list) != len(truth_list):
+                return False
+
+            import pandas as pd
+            # Attempt to parse each item as a date
+            try:
+                value_dates = [pd.to_datetime(item).date() for item in value_list]
+                truth_dates = [pd.to_datetime(item).date() for item in truth_list]
+                return set(value_dates) == set(truth_dates)
+            except (ValueError, TypeError):
+                # If parsing as dates fails, compare as strings
+                return set(value_list) == set(truth_list)
+        except Exception:
+            return False
+    elif semantic == "list[number]":
+        try:
+            value_list = sorted(float(''.join(c for c in v.strip() if c.isdigit() or c in ['.', '-']))
+                                for v in str(value).strip('[]').split(',') if v.strip())
+            truth_list = sorted(float(''.join(c for c in t.strip() if c.isdigit() or c in ['.', '-']))
+                                for t in str(truth).strip('[]').split(',') if t.strip())
+
+            value_list = [int(v * 100) / 100 for v in value_list]
+            truth_list = [int(t * 100) / 100 for t in truth_list]
+
+            if len(value_list) != len(truth_list):
+                return False
+
+            return set(value_list) == set(truth_list)
+        except Exception:
+            return False
+    else:
+        raise ValueError(f"Semantic not supported: {semantic}")
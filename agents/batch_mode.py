@@ -0,0 +1,173 @@
+import json
+
+from agents.response_cache import request_key
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+
+class DeferredRequest(Exception):
+    """
+    Raised by LLMClient in batch mode for a request that has no response yet.
+
+    The request has been added to the client's BatchCollector; the question is
+    answered in a later pass, once the batch results are in the response cache.
+    """
+
+    def __init__(self, request):
+        super().__init__(f"Request deferred to batch: {request_key(request)}")
+        self.request = request
+
+
+class BatchCollector:
+    """
+    Collects the requests deferred by LLMClient and writes them as an OpenAI Batch API input file.
+
+    Each request appears once, with custom_id set to its ResponseCache key, so identical
+    prompts are only paid for once and results can be stored back under the same key.
+    """
+
+    def __init__(self):
+        """Initialize an empty collector."""
+        self.requests = {}
+
+    def add(self, request):
+        """
+        Args:
+            request (dict): Keyword arguments for client.chat.completions.create
+        """
+        self.requests.setdefault(request_key(request), request)
+
+    def __len__(self):
+        return len(self.requests)
+
+    def write(self, batch_path):
+        """
+        Write the collected requests as JSONL, one Batch API request per line.
+
+        Args:
+            batch_path (str): Path of the file to write
+        """
+        with open(batch_path, 'w', encoding='utf-8') as f:
+            for custom_id, request in self.requests.items():
+                line = {'custom_id': custom_id, 'method': 'POST', 'url': BATCH_ENDPOINT, 'body': request}
+                f.write(json.dumps(line, ensure_ascii=False) + '\n')
+
+
+def read_batch_results(results_path):
+    """
+    Read a Batch API output file.
+
+    Args:
+        results_path (str): Path of the JSONL results file
+
+    Returns:
+        list: (custom_id, model, content) tuples. content is None for failed requests.
+    """
+    results = []
+    with open(results_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get('response') or {}
+            body = response.get('body') or {}
+            if result.get('error') or response.get('status_code') != 200:
+                print(f"Batch request {result.get('custom_id')} failed: {result.get('error') or body.get('error')}")
+                results.append((result.get('custom_id'), body.get('model'), None))
+                continue
+            content = body['choices'][0]['message']['content'].strip()
+            results.append((result['custom_id'], body.get('model'), content))
+    return results
+
+
+class LocalBatchRunner:
+    """
+    Stand-in for the Batch API that fulfils a batch input file locally.
+
+    Responses come from a responder: a ResponseCache (requests it has not seen fail)
+    or any function taking the request body and returning the response content.
+    The output has the same layout as the files the Batch API returns.
+    """
+
+    def __init__(self, responder):
+        """
+        Args:
+            responder (ResponseCache or callable): Source of the response contents
+        """
+        self.responder = responder.get if hasattr(responder, 'get') else responder
+
+    def run(self, batch_path, results_path):
+        """
+        Answer every request of a batch input file.
+
+        Args:
+            batch_path (str): Batch input JSONL file
+            results_path (str): Path of the output JSONL file to write
+
+        Returns:
+            int: Number of requests answered
+        """
+        answered = 0
+        with open(batch_path, 'r', encoding='utf-8') as batch, open(results_path, 'w', encoding='utf-8') as output:
+            for number, line in enumerate(batch):
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                content = self.responder(request['body'])
+                result = {'id': f'batch_req_{number}', 'custom_id': request['custom_id'], 'error': None}
+                if content is None:
+                    result['response'] = None
+                    result['error'] = {'code': 'not_found', 'message': 'No response available for this request'}
+                else:
+                    answered += 1
+                    result['response'] = {
+                        'status_code': 200,
+                        'body': {
+                            'model': request['body'].get('model'),
+                            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}}],
+                        },
+                    }
+                output.write(json.dumps(result, ensure_ascii=False) + '\n')
+        return answered
+
+
+def submit_batch(client, batch_path, completion_window='24h'):
+    """
+    Upload a batch input file and start the batch on the OpenAI Batch API.
+
+    Args:
+        client (OpenAI): OpenAI client
+        batch_path (str): Batch input JSONL file
+        completion_window (str): Time the API has to complete the batch
+
+    Returns:
+        str: The batch id
+    """
+    with open(batch_path, 'rb') as f:
+        input_file = client.files.create(file=f, purpose='batch')
+    batch = client.batches.create(input_file_id=input_file.id, endpoint=BATCH_ENDPOINT,
+                                  completion_window=completion_window)
+    return batch.id
+
+
+def download_batch_results(client, batch_id, results_path):
+    """
+    Save the output of a finished batch.
+
+    Args:
+        client (OpenAI): OpenAI client
+        batch_id (str): Id returned by submit_batch
+        results_path (str): Path of the output JSONL file to write
+
+    Returns:
+        bool: False if the batch has not finished yet
+    """
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != 'completed':
+        print(f"Batch {batch_id} is {batch.status}")
+        return False
+    with open(results_path, 'wb') as f:
+        f.write(client.files.content(batch.output_file_id).read())
+    if batch.error_file_id:
+        print(f"Some requests failed, see error file {batch.error_file_id}")
+    return True
@@ -0,0 +1,106 @@
+import os
+import json
+import threading
+
+
+class FailedResponse(str):
+    """
+    Text standing in for the response to a request that failed (outage, quota...).
+
+    It is written to the responses file like any response, but journaled as failed,
+    so that a resumed run asks the question again.
+    """
+
+
+class CheckpointJournal:
+    """
+    Append-only record of the answered questions of an evaluation run.
+
+    Each answer is written as one JSON line {"index", "question", "response"} as soon
+    as it is known and flushed to disk, so a crash or Ctrl-C loses at most the
+    questions in flight. Responses are stored as the text written to the responses
+    file, so a resumed run writes exactly the same file as an uninterrupted one.
+    Failed requests (FailedResponse) are recorded with "failed": true and not
+    treated as answered when resuming.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path of the journal file
+        """
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self, test_qa):
+        """
+        Read the answers recorded by a previous run.
+
+        A partially written last line (from a crash) is ignored, as are failed requests
+        and entries whose question no longer matches the test QA file.
+
+        Args:
+            test_qa (list): Questions of the run, as returned by EvalAgent.load_test_qa
+
+        Returns:
+            dict: Question index -> response text
+        """
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                index = entry.get('index')
+                if not isinstance(index, int) or not 0 <= index < len(test_qa):
+                    continue
+                if entry.get('question') != test_qa[index]['question']:
+                    print(f"Ignoring checkpoint for question {index}: the question has changed")
+                    continue
+                if entry.get('failed'):
+                    continue
+                done[index] = entry['response']
+        return done
+
+    def open(self, resume=False):
+        """
+        Start writing the journal.
+
+        Args:
+            resume (bool): Append to the existing journal instead of starting a new one
+        """
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and self._file.tell() > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    # Terminate the line a crash left half-written
+                    self._file.write('\n')
+
+    def record(self, index, question, response):
+        """
+        Append the answer to a question.
+
+        Args:
+            index (int): Index of the question in the test QA file
+            question (str): The question
+            response: The parsed response, stored as the text written to the responses file
+                (a FailedResponse is marked as failed)
+        """
+        entry = {'index': index, 'question': question, 'response': str(response)}
+        if isinstance(response, FailedResponse):
+            entry['failed'] = True
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        """Stop writing the journal."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
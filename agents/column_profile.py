@@ -0,0 +1,199 @@
+import os
+import csv
+import json
+from collections import Counter
+
+from agents.csv_cache import CSVCache
+
+TOP_K = 5
+NUM_EXAMPLES = 3
+MAX_VALUE_CHARS = 40
+BOOLEAN_VALUES = {'true', 'false'}
+
+
+def infer_dtype(values):
+    """
+    Infer the type of a column from its non-empty values.
+
+    Args:
+        values (list): Non-empty cells of the column as strings
+
+    Returns:
+        str: One of 'int', 'float', 'bool', 'str' or 'empty'
+    """
+    if not values:
+        return 'empty'
+    if all(value.lower() in BOOLEAN_VALUES for value in values):
+        return 'bool'
+    try:
+        [int(value) for value in values]
+        return 'int'
+    except ValueError:
+        pass
+    try:
+        [float(value) for value in values]
+        return 'float'
+    except ValueError:
+        return 'str'
+
+
+def profile_column(name, cells, top_k=TOP_K, num_examples=NUM_EXAMPLES):
+    """
+    Summarize a single column.
+
+    Args:
+        name (str): Column name
+        cells (list): The column's cells as strings
+        top_k (int): Number of most frequent values to keep
+        num_examples (int): Number of distinct example values to keep
+
+    Returns:
+        dict: name, dtype, null_count, min, max, distinct_count, top_values and examples
+    """
+    values = [cell for cell in cells if cell != '']
+    dtype = infer_dtype(values)
+    counts = Counter(values)
+
+    minimum = maximum = None
+    if dtype in ('int', 'float'):
+        to_number = int if dtype == 'int' else float
+        numbers = [to_number(value) for value in values]
+        minimum, maximum = min(numbers), max(numbers)
+    elif values:
+        minimum, maximum = min(values), max(values)
+
+    return {
+        'name': name,
+        'dtype': dtype,
+        'null_count': len(cells) - len(values),
+        'min': minimum,
+        'max': maximum,
+        'distinct_count': len(counts),
+        'top_values': [[value, count] for value, count in counts.most_common(top_k)],
+        'examples': list(counts)[:num_examples],
+    }
+
+
+def profile_rows(rows):
+    """
+    Profile every column of a dataset.
+
+    Args:
+        rows (list): CSV rows where the first row contains column names (any sequence of rows, such as a ColumnarTable or MappedCSV)
+
+    Returns:
+        dict: 'num_rows' and 'columns', a list of column profiles in header order
+    """
+    iterator = iter(rows)
+    header = next(iterator, [])
+    columns = [[] for _ in header]
+    num_rows = 0
+    for row in iterator:
+        num_rows += 1
+        for i, column in enumerate(columns):
+            column.append(row[i] if i < len(row) else '')
+    return {
+        'num_rows': num_rows,
+        'columns': [profile_column(name, cells) for name, cells in zip(header, columns)],
+    }
+
+
+def shorten(value, max_chars=MAX_VALUE_CHARS):
+    """Shorten a value for display in a schema."""
+    text = str(value)
+    return text if len(text) <= max_chars else text[:max_chars - 3] + '...'
+
+
+def render_schema(profile, columns=None):
+    """
+    Render a profile as a compact schema to send to a model instead of the full table.
+
+    Args:
+        profile (dict): Profile returned by profile_rows
+        columns (list, optional): Only describe these columns
+
+    Returns:
+        str: One line per column with its type, null count, range, distinct count and frequent values
+    """
+    lines = [f"Rows: {profile['num_rows']}", "Columns:"]
+    for column in profile['columns']:
+        if columns is not None and column['name'] not in columns:
+            continue
+        parts = [column['dtype'], f"nulls={column['null_count']}", f"distinct={column['distinct_count']}"]
+        if column['min'] is not None:
+            parts.append(f"range=[{shorten(column['min'])} .. {shorten(column['max'])}]")
+        if column['dtype'] in ('str', 'bool'):
+            parts.append("top=" + ", ".join(f"{shorten(value)!r} ({count})" for value, count in column['top_values']))
+        else:
+            parts.append("examples=" + ", ".join(shorten(value) for value in column['examples']))
+        lines.append(f"- {column['name']}: " + "; ".join(parts))
+    return "\n".join(lines)
+
+
+class ColumnProfiler:
+    """
+    Computes column profiles and keeps them as .<split>.csv.profile.json sidecar files,
+    recomputing a profile only when its CSV file changes.
+    """
+
+    def __init__(self, cache=None):
+        """
+        Args:
+            cache (CSVCache, optional): Sidecar helper used to validate stored profiles
+        """
+        self.cache = cache or CSVCache()
+
+    def load(self, csv_path):
+        """
+        Args:
+            csv_path (str): Path to the CSV file
+
+        Returns:
+            dict: The stored profile, or None if it is missing or out of date
+        """
+        profile_path = self.cache.sidecar_path(csv_path, 'profile.json')
+        if not os.path.exists(profile_path) or not self.cache.is_fresh(csv_path, key='profile'):
+            return None
+        try:
+            with open(profile_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def profile(self, csv_path, rows=None, stats=None):
+        """
+        Get the profile of a CSV file, computing and storing it if needed.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            rows (list, optional): The file's rows if already loaded; otherwise the file
+                is streamed from disk when the profile has to be computed
+            stats (dict, optional): Its 'bytes' entry is increased by the bytes read from
+                disk: the stored profile, or the CSV file when it is streamed
+
+        Returns:
+            dict: The profile
+        """
+        stored = self.load(csv_path)
+        if stored is not None:
+            if stats is not None:
+                stats['bytes'] += os.path.getsize(self.cache.sidecar_path(csv_path, 'profile.json'))
+            return stored
+
+        signature = self.cache.signature(csv_path)
+        if rows is None:
+            with open(csv_path, 'r') as csv_file:
+                profile = profile_rows(csv.reader(csv_file))
+            if stats is not None:
+                stats['bytes'] += os.path.getsize(csv_path)
+        else:
+            profile = profile_rows(rows)
+        profile_path = self.cache.sidecar_path(csv_path, 'profile.json')
+        try:
+            with open(f'{profile_path}.tmp', 'w') as f:
+                json.dump(profile, f)
+            os.replace(f'{profile_path}.tmp', profile_path)
+            self.cache.write_meta(csv_path, 'profile', signature)
+        except OSError as e:
+            print(f"Could not write profile {profile_path}: {str(e)}")
+        return profile
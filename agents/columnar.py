@@ -0,0 +1,256 @@
+import numpy as np
+
+BLOCK_ROWS = 1024
+
+
+class Column:
+    """
+    A single typed column of a ColumnarTable.
+
+    Numeric columns store their values in a NumPy array with a boolean null mask.
+    Text columns are dictionary-encoded: an integer code per row pointing into a
+    list of distinct strings.
+    """
+
+    def __init__(self, name, kind, values, nulls=None, categories=None):
+        """
+        Args:
+            name (str): Column name
+            kind (str): One of 'int', 'float' or 'category'
+            values (np.ndarray): Numeric values, or category codes for 'category' columns
+            nulls (np.ndarray, optional): Boolean mask of empty cells for numeric columns
+            categories (list, optional): Distinct strings for 'category' columns
+        """
+        self.name = name
+        self.kind = kind
+        self.values = values
+        self.nulls = nulls
+        self.categories = categories
+
+    @classmethod
+    def from_strings(cls, name, cells):
+        """
+        Build a column from CSV cells, picking the most compact exact representation.
+
+        A column is stored as numbers only if every non-empty cell renders back to
+        exactly the same text, so the row view is identical to the original CSV.
+
+        Args:
+            name (str): Column name
+            cells (list): The column's cells as strings
+
+        Returns:
+            Column: The encoded column
+        """
+        nulls = np.fromiter((cell == '' for cell in cells), dtype=bool, count=len(cells))
+        filled = [cell for cell in cells if cell != '']
+
+        if filled:
+            try:
+                ints = [int(cell) for cell in filled]
+                if all(str(value) == cell for value, cell in zip(ints, filled)):
+                    values = np.zeros(len(cells), dtype=np.int64)
+                    values[~nulls] = ints
+                    return cls(name, 'int', values, nulls=nulls)
+            except (ValueError, OverflowError):
+                pass
+
+            try:
+                floats = [float(cell) for cell in filled]
+                if all(repr(value) == cell for value, cell in zip(floats, filled)):
+                    values = np.full(len(cells), np.nan, dtype=np.float64)
+                    values[~nulls] = floats
+                    return cls(name, 'float', values, nulls=nulls)
+            except ValueError:
+                pass
+
+        lookup = {}
+        codes = np.fromiter((lookup.setdefault(cell, len(lookup)) for cell in cells),
+                            dtype=np.int32, count=len(cells))
+        return cls(name, 'category', codes, categories=list(lookup))
+
+    def render(self, start, stop):
+        """
+        Render a range of cells back to their CSV text.
+
+        Args:
+            start (int): First row (inclusive)
+            stop (int): Last row (exclusive)
+
+        Returns:
+            list: The cells as strings
+        """
+        if self.kind == 'category':
+            categories = self.categories
+            return [categories[code] for code in self.values[start:stop].tolist()]
+        to_text = str if self.kind == 'int' else repr
+        return ['' if null else to_text(value)
+                for value, null in zip(self.values[start:stop].tolist(), self.nulls[start:stop].tolist())]
+
+    def to_series_values(self):
+        """
+        Convert the column to values suitable for a pandas Series.
+
+        Returns:
+            np.ndarray or list: Floats with NaN for empty numeric cells, otherwise strings with None for empty cells
+        """
+        if self.kind == 'int':
+            if self.nulls.any():
+                values = self.values.astype(np.float64)
+                values[self.nulls] = np.nan
+                return values
+            return self.values
+        if self.kind == 'float':
+            return self.values
+        categories = [category if category != '' else None for category in self.categories]
+        return [categories[code] for code in self.values.tolist()]
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the column in bytes."""
+        total = self.values.nbytes
+        if self.nulls is not None:
+            total += self.nulls.nbytes
+        if self.categories is not None:
+            total += sum(len(category) for category in self.categories)
+        return total
+
+
+class ColumnarTable:
+    """
+    A dataset held column by column instead of as a list of CSV rows.
+
+    The table still behaves like the list of rows DataAgent normally stores:
+    table[0] is the header, table[i] is a row of strings, and iterating yields rows,
+    so the models' prompt builders work unchanged.
+    """
+
+    def __init__(self, column_names, columns, num_rows):
+        """
+        Args:
+            column_names (list): Header row
+            columns (list): List of Column objects, one per column
+            num_rows (int): Number of data rows (excluding the header)
+        """
+        self.column_names = column_names
+        self.columns = columns
+        self.num_rows = num_rows
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build a columnar table from CSV rows.
+
+        Args:
+            rows (list): List of CSV rows where the first row contains column names
+
+        Returns:
+            ColumnarTable: The table, or None if the rows are empty or ragged and cannot be stored by column
+        """
+        if not rows:
+            return None
+        column_names = rows[0]
+        body = rows[1:]
+        width = len(column_names)
+        if any(len(row) != width for row in body):
+            return None
+
+        columns = [Column.from_strings(name, [row[i] for row in body])
+                   for i, name in enumerate(column_names)]
+        return cls(column_names, columns, len(body))
+
+    @classmethod
+    def from_arrow(cls, table):
+        """
+        Rebuild a columnar table from the Arrow table written by to_arrow, without
+        going through Python rows.
+
+        Args:
+            table (pyarrow.Table): Table as returned by to_arrow (e.g. read back from Parquet)
+
+        Returns:
+            ColumnarTable: The table
+        """
+        import json
+        import pyarrow as pa
+        column_names = json.loads(table.schema.metadata[b'header'])
+        columns = []
+        for name, chunked in zip(column_names, table.columns):
+            array = chunked.combine_chunks()
+            if pa.types.is_dictionary(array.type):
+                codes = array.indices.to_numpy(zero_copy_only=False).astype(np.int32, copy=False)
+                columns.append(Column(name, 'category', codes, categories=array.dictionary.to_pylist()))
+                continue
+            kind = 'int' if pa.types.is_integer(array.type) else 'float'
+            nulls = array.is_null().to_numpy(zero_copy_only=False)
+            values = array.fill_null(0 if kind == 'int' else float('nan')).to_numpy(zero_copy_only=False)
+            columns.append(Column(name, kind, values, nulls=nulls))
+        return cls(column_names, columns, table.num_rows)
+
+    def to_arrow(self):
+        """
+        Convert the table to Arrow, keeping the column kinds: int64 and float64 columns
+        with their null masks, and dictionary-encoded strings for category columns.
+
+        Returns:
+            pyarrow.Table: The table, with the header stored in the schema metadata
+        """
+        import json
+        import pyarrow as pa
+        arrays = {}
+        for i, column in enumerate(self.columns):
+            if column.kind == 'category':
+                arrays[f'c{i}'] = pa.DictionaryArray.from_arrays(
+                    pa.array(column.values, type=pa.int32()), pa.array(column.categories, type=pa.string()))
+            else:
+                arrays[f'c{i}'] = pa.array(column.values, mask=column.nulls)
+        return pa.table(arrays, metadata={'header': json.dumps(self.column_names)})
+
+    def __len__(self):
+        return self.num_rows + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("row index out of range")
+        if index == 0:
+            return list(self.column_names)
+        return [column.render(index - 1, index)[0] for column in self.columns]
+
+    def __iter__(self):
+        yield list(self.column_names)
+        for start in range(0, self.num_rows, BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, self.num_rows)
+            rendered = [column.render(start, stop) for column in self.columns]
+            yield from (list(row) for row in zip(*rendered))
+
+    def dtypes(self):
+        """
+        Returns:
+            dict: Mapping of column name to 'int', 'float' or 'category'
+        """
+        return {column.name: column.kind for column in self.columns}
+
+    def to_dataframe(self):
+        """
+        Build a pandas DataFrame directly from the typed columns, without re-parsing CSV text.
+
+        The dtypes are not those of pd.read_csv on the same file: only cells that round-trip
+        exactly are numbers, so "True"/"False" and "1e5" stay strings. Use read_csv where
+        code depends on its inference (as CodeBasedModel does).
+
+        Returns:
+            pd.DataFrame: The table as a DataFrame
+        """
+        import pandas as pd
+        frame = pd.DataFrame({i: column.to_series_values() for i, column in enumerate(self.columns)})
+        frame.columns = self.column_names
+        return frame
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the table in bytes."""
+        return sum(column.nbytes for column in self.columns)
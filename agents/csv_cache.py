@@ -0,0 +1,159 @@
+import os
+import json
+import hashlib
+
+HASH_CHUNK_BYTES = 1 << 20
+
+
+class CSVCache:
+    """
+    Keeps binary copies of parsed CSV files as Parquet sidecar files.
+
+    The cached tables hold the typed columns of a ColumnarTable, so a cache hit skips
+    both the CSV parse and the type inference. For a file competition/<folder>/all.csv the cache is written next to it as
+    .all.csv.parquet, together with .all.csv.meta.json recording the size,
+    modification time and SHA-256 of the CSV it was built from. A sidecar is only
+    reused while those still match the CSV on disk.
+    """
+
+    def sidecar_path(self, csv_path, suffix):
+        """
+        Args:
+            csv_path (str): Path to the source CSV file
+            suffix (str): Sidecar extension, e.g. 'parquet' or 'meta.json'
+
+        Returns:
+            str: Path of the hidden sidecar file next to the CSV
+        """
+        folder, filename = os.path.split(csv_path)
+        return os.path.join(folder, f'.{filename}.{suffix}')
+
+    def file_hash(self, path):
+        """
+        Compute the SHA-256 of a file without reading it into memory at once.
+
+        Args:
+            path (str): Path to the file
+
+        Returns:
+            str: Hex digest of the file content
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def signature(self, csv_path):
+        """
+        Args:
+            csv_path (str): Path to the CSV file
+
+        Returns:
+            dict: Size, modification time and content hash of the file
+        """
+        stat = os.stat(csv_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': self.file_hash(csv_path)}
+
+    def is_fresh(self, csv_path, key='source'):
+        """
+        Check whether the sidecars of a CSV file were built from its current content.
+
+        Size and modification time are checked first. If only the modification time
+        changed, the content hash decides, and the recorded time is refreshed so the
+        next check is cheap again.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            key (str): Entry of the meta file to check, one per kind of sidecar
+
+        Returns:
+            bool: True if the sidecars can be reused
+        """
+        meta_path = self.sidecar_path(csv_path, 'meta.json')
+        try:
+            with open(meta_path, 'r') as f:
+                recorded = json.load(f)[key]
+        except (OSError, ValueError, KeyError):
+            return False
+
+        stat = os.stat(csv_path)
+        if recorded['size'] != stat.st_size:
+            return False
+        if recorded['mtime_ns'] == stat.st_mtime_ns:
+            return True
+        if recorded['sha256'] != self.file_hash(csv_path):
+            return False
+        recorded['mtime_ns'] = stat.st_mtime_ns
+        self.write_meta(csv_path, key, recorded)
+        return True
+
+    def write_meta(self, csv_path, key='source', signature=None):
+        """
+        Record the signature a sidecar was built from in the CSV's meta file.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            key (str): Entry of the meta file to update
+            signature (dict, optional): Signature to record, computed from the file if not given
+        """
+        meta_path = self.sidecar_path(csv_path, 'meta.json')
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        meta[key] = signature or self.signature(csv_path)
+        tmp_path = f'{meta_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def load(self, csv_path):
+        """
+        Read the cached table of a CSV file.
+
+        The Arrow table is returned as is: turning it back into Python rows costs more
+        than parsing the CSV again, so only typed columnar representations are built from it
+        (see ColumnarTable.from_arrow).
+
+        Args:
+            csv_path (str): Path to the CSV file
+
+        Returns:
+            pyarrow.Table: The cached table, or None if there is no valid cache
+        """
+        parquet_path = self.sidecar_path(csv_path, 'parquet')
+        if not os.path.exists(parquet_path) or not self.is_fresh(csv_path):
+            return None
+
+        import pyarrow.parquet as pq
+        try:
+            return pq.read_table(parquet_path)
+        except Exception as e:
+            print(f"Ignoring unreadable cache {parquet_path}: {str(e)}")
+            return None
+
+    def save(self, csv_path, table):
+        """
+        Write the parsed table of a CSV file to its Parquet sidecar.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            table (pyarrow.Table): The table, e.g. from ColumnarTable.to_arrow
+
+        Returns:
+            bool: True if the cache was written
+        """
+        import pyarrow.parquet as pq
+        parquet_path = self.sidecar_path(csv_path, 'parquet')
+        try:
+            signature = self.signature(csv_path)
+            tmp_path = f'{parquet_path}.tmp'
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, parquet_path)
+            self.write_meta(csv_path, 'source', signature)
+            return True
+        except Exception as e:
+            print(f"Could not write cache {parquet_path}: {str(e)}")
+            return False
@@ -2,6 +2,66 @@ import os
 import csv
 import sys
 import argparse
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agents.csv_cache import CSVCache
+from agents.row_index import MappedCSV
+from agents.column_profile import ColumnProfiler, profile_rows
+
+SPLITS = ('sample', 'all')
+
+
+class LazyDataset(dict):
+    """
+    A dataset entry whose splits are read from disk the first time they are accessed.
+    Behaves like the plain dictionary used by DataAgent, so models can keep using
+    data[name]['sample'] and `dataset_type in data[name]`.
+    """
+
+    def __init__(self, agent, folder_name, csv_paths):
+        """
+        Args:
+            agent (DataAgent): Agent responsible for loading and evicting splits
+            folder_name (str): Name of the competition folder
+            csv_paths (dict): Mapping of split name to CSV path for the splits that exist on disk
+        """
+        super().__init__()
+        self.agent = agent
+        self.folder_name = folder_name
+        self.csv_paths = csv_paths
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.csv_paths
+
+    def __getitem__(self, key):
+        if key in self.csv_paths:
+            self.agent.touch_split(self.folder_name, key)
+        return super().__getitem__(key)
+
+    def __missing__(self, key):
+        if key not in self.csv_paths:
+            raise KeyError(key)
+        return self.agent.load_split(self.folder_name, key)
+
+
+def read_folder_in_process(options, folder_name, folder_path):
+    """
+    Read a competition folder in a worker process.
+
+    Args:
+        options (dict): Keyword arguments for the worker's DataAgent
+        folder_name (str): Name of the competition folder
+        folder_path (str): Path to the competition folder
+
+    Returns:
+        tuple: (entry, stats) as returned by DataAgent.read_folder
+    """
+    return DataAgent(**options).read_folder(folder_name, folder_path)
+
 
 class DataAgent:
     """
@@ -9,9 +69,37 @@ class DataAgent:
     The data is stored in a nested dictionary structure organized by competition folders.
     """
     
-    def __init__(self):
-        """Initialize an empty DataAgent with a dictionary to store the loaded data."""
+    def __init__(self, lazy=False, max_loaded=None, columnar=False, cache=False, mapped=False,
+                 profiles=False):
+        """
+        Initialize an empty DataAgent with a dictionary to store the loaded data.
+
+        Args:
+            lazy (bool): If True, a split is only read from disk the first time it is accessed
+            max_loaded (int, optional): In lazy mode, the maximum number of 'all' splits kept
+                in memory. The least recently used ones are dropped and re-read on demand.
+            columnar (bool): If True, each split is stored as a ColumnarTable (typed NumPy
+                columns and dictionary-encoded strings) instead of a list of rows
+            cache (bool): If True, columnar splits are cached as Parquet sidecar files
+                (see CSVCache) and later loads read the typed columns instead of the CSV.
+                Sidecar indexes and profiles are validated with the same helper.
+            mapped (bool): If True, the 'all' split is memory-mapped with a persisted
+                row-offset index (see MappedCSV) and rows are only parsed when accessed
+            profiles (bool): If True, a profile of every column (see ColumnProfiler) is stored
+                as '<split>_profile' in each dataset entry and persisted next to the CSV
+        """
         self.data = {}
+        self.lazy = lazy
+        self.max_loaded = max_loaded
+        self.columnar = columnar
+        self.cache = CSVCache() if cache else None
+        self.mapped = mapped
+        self.competition_dir = None
+        self._mapped_files = {}
+        self.load_stats = {}
+        self.profiler = ColumnProfiler(self.cache) if profiles else None
+        self._loaded = OrderedDict()  # (folder_name, 'all') in least recently used order
+        self._lock = threading.RLock()
 
     def extract_column_names(self, data):
         """
@@ -27,12 +115,17 @@ class DataAgent:
             return data[0]  # First row contains column names
         return []
 
-    def load_data(self, competition_dir):
+    def load_data(self, competition_dir, workers=None, use_processes=False):
         """
         Load CSV data from a competition directory structure.
         
         Args:
             competition_dir (str): Path to the directory containing competition folders
+            workers (int, optional): Number of folders to parse concurrently. Per-folder
+                load time and bytes read are recorded in self.load_stats either way and
+                printed when workers is given.
+            use_processes (bool): Parse folders in a process pool instead of a thread pool.
+                Only used when splits are fully parsed up front (not lazy or mapped).
             
         Each competition folder should contain:
             - sample.csv: Sample dataset
@@ -45,35 +138,356 @@ class DataAgent:
                 'all': [...],
                 'all_column_names': [...]
             }}
+
+        In lazy mode the entries are LazyDataset objects: the column names are read
+        up front and the rows of each split are parsed the first time it is accessed.
         """
         if not os.path.exists(competition_dir):
             print(f"Error: Competition directory not found: {competition_dir}")
             return False
             
+        self.competition_dir = competition_dir
         try:
-            for folder_name in os.listdir(competition_dir):
-                folder_path = os.path.join(competition_dir, folder_name)
-                if os.path.isdir(folder_path):
-                    self.data[folder_name] = {}
-                    sample_csv_path = os.path.join(folder_path, 'sample.csv')
-                    all_csv_path = os.path.join(folder_path, 'all.csv')
-                    
-                    if os.path.exists(sample_csv_path):
-                        with open(sample_csv_path, 'r') as sample_file:
-                            sample_data = list(csv.reader(sample_file))
-                            self.data[folder_name]['sample'] = sample_data
-                            self.data[folder_name]['sample_column_names'] = self.extract_column_names(sample_data)
-                    
-                    if os.path.exists(all_csv_path):
-                        with open(all_csv_path, 'r') as all_file:
-                            all_data = list(csv.reader(all_file))
-                            self.data[folder_name]['all'] = all_data
-                            self.data[folder_name]['all_column_names'] = self.extract_column_names(all_data)
+            folders = [(folder_name, os.path.join(competition_dir, folder_name))
+                       for folder_name in sorted(os.listdir(competition_dir))]
+            folders = [(folder_name, folder_path) for folder_name, folder_path in folders
+                       if os.path.isdir(folder_path)]
+
+            if not workers or workers <= 1:
+                for folder_name, folder_path in folders:
+                    self.load_folder(folder_name, folder_path)
+            elif use_processes and not self.lazy and not self.mapped:
+                # Workers read folders exactly as this agent would
+                options = {'columnar': self.columnar, 'cache': self.cache is not None,
+                           'profiles': self.profiler is not None}
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    futures = [executor.submit(read_folder_in_process, options, folder_name, folder_path)
+                               for folder_name, folder_path in folders]
+                    for (folder_name, _), future in zip(folders, futures):
+                        self.data[folder_name], self.load_stats[folder_name] = future.result()
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    list(executor.map(lambda folder: self.load_folder(*folder), folders))
+
+            if workers:
+                self.print_load_stats()
             return True
         except Exception as e:
             print(f"Error loading data: {str(e)}")
             return False
 
+    def load_folder(self, folder_name, folder_path):
+        """
+        Load the splits of a single competition folder into self.data.
+
+        In lazy mode only the column names are read; the rows are parsed on first access.
+
+        Args:
+            folder_name (str): Name of the competition folder
+            folder_path (str): Path to the competition folder
+        """
+        entry, stats = self.read_folder(folder_name, folder_path)
+        with self._lock:
+            self.data[folder_name] = entry
+            self.load_stats[folder_name] = stats
+
+    def read_folder(self, folder_name, folder_path):
+        """
+        Read the splits of a single competition folder without storing them.
+
+        Args:
+            folder_name (str): Name of the competition folder
+            folder_path (str): Path to the competition folder
+
+        Returns:
+            tuple: (entry, stats) where entry is the folder's dictionary for self.data and
+            stats holds the load time in seconds and the number of bytes read from disk:
+            the CSV files that were parsed, the Parquet caches, row indexes and profiles
+            that were reused, and only the headers in lazy mode
+        """
+        start = time.perf_counter()
+        csv_paths = {}
+        for split in SPLITS:
+            csv_path = os.path.join(folder_path, f'{split}.csv')
+            if os.path.exists(csv_path):
+                csv_paths[split] = csv_path
+
+        stats = {'seconds': 0.0, 'bytes': 0}
+        if not self.lazy:
+            entry = {}
+            for split, csv_path in csv_paths.items():
+                split_data = self.read_split(csv_path, split, stats)
+                entry[split] = split_data
+                entry[f'{split}_column_names'] = self.extract_column_names(split_data)
+                if self.profiler:
+                    entry[f'{split}_profile'] = self.profiler.profile(csv_path, split_data, stats)
+        else:
+            entry = LazyDataset(self, folder_name, csv_paths)
+            for split, csv_path in csv_paths.items():
+                entry[f'{split}_column_names'] = self.read_header(csv_path, stats)
+                if self.profiler:
+                    entry[f'{split}_profile'] = self.profiler.profile(csv_path, stats=stats)
+
+        stats['seconds'] = time.perf_counter() - start
+        return entry, stats
+
+    def print_load_stats(self):
+        """Print the load time and bytes read for every loaded folder."""
+        print(f"{'Folder':<30} {'Seconds':>8} {'MB':>10}")
+        for folder_name, stats in sorted(self.load_stats.items()):
+            print(f"{folder_name:<30} {stats['seconds']:>8.3f} {stats['bytes'] / 1e6:>10.2f}")
+        total_bytes = sum(stats['bytes'] for stats in self.load_stats.values())
+        print(f"{'Total':<30} {'':>8} {total_bytes / 1e6:>10.2f}")
+
+    def read_csv(self, csv_path):
+        """
+        Parse a CSV file into a list of rows.
+
+        Args:
+            csv_path (str): Path to the CSV file
+
+        Returns:
+            list: List of CSV rows, the first row being the column names
+        """
+        with open(csv_path, 'r') as csv_file:
+            return list(csv.reader(csv_file))
+
+    def read_split(self, csv_path, split=None, stats=None):
+        """
+        Read a split from disk in the representation selected for this agent.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            split (str, optional): Either 'sample' or 'all'
+            stats (dict, optional): Its 'bytes' entry is increased by the bytes read from
+                disk: the CSV file, or the Parquet cache or row index when one is reused
+
+        Returns:
+            list, ColumnarTable or MappedCSV: The split's rows. Columnar mode falls back to
+            a list of rows when the file has ragged rows.
+        """
+        if stats is None:
+            stats = {'bytes': 0}
+        if self.mapped and split == 'all':
+            return self.open_mapped(csv_path, stats)
+        if not self.columnar:
+            # Python rows are built fastest by csv.reader itself, so the Parquet cache isn't used for them
+            stats['bytes'] += os.path.getsize(csv_path)
+            return self.read_csv(csv_path)
+
+        from agents.columnar import ColumnarTable
+        cached = self.cache.load(csv_path) if self.cache else None
+        if cached is not None:
+            stats['bytes'] += os.path.getsize(self.cache.sidecar_path(csv_path, 'parquet'))
+            return ColumnarTable.from_arrow(cached)
+        stats['bytes'] += os.path.getsize(csv_path)
+        rows = self.read_csv(csv_path)
+        table = ColumnarTable.from_rows(rows)
+        if table is None:
+            return rows
+        if self.cache:
+            self.cache.save(csv_path, table.to_arrow())
+        return table
+
+    def open_mapped(self, csv_path, stats=None):
+        """
+        Memory-map a CSV file, reusing the mapping if the file is already open.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            stats (dict, optional): Its 'bytes' entry is increased by the bytes read to
+                open the file (nothing when the mapping is reused, see MappedCSV.open)
+
+        Returns:
+            MappedCSV: The mapped file
+        """
+        with self._lock:
+            if csv_path not in self._mapped_files:
+                self._mapped_files[csv_path] = MappedCSV.open(csv_path, self.cache, stats)
+            return self._mapped_files[csv_path]
+
+    def csv_path(self, dataset_name, dataset_type='sample'):
+        """
+        Args:
+            dataset_name (str): The competition dataset folder name
+            dataset_type (str): Either 'sample' or 'all'
+
+        Returns:
+            str: Path of the split's CSV file in the loaded competition directory
+        """
+        if self.competition_dir is None:
+            raise FileNotFoundError("No competition directory has been loaded.")
+        csv_path = os.path.join(self.competition_dir, dataset_name, f'{dataset_type}.csv')
+        if not os.path.exists(csv_path):
+            raise FileNotFoundError(f"Dataset {dataset_name}/{dataset_type}.csv not found.")
+        return csv_path
+
+    def open_rows(self, dataset_name, dataset_type='all'):
+        """
+        Get random access to a split's rows without parsing the whole file.
+
+        Args:
+            dataset_name (str): The competition dataset folder name
+            dataset_type (str): Either 'sample' or 'all' (default: 'all')
+
+        Returns:
+            MappedCSV: Supports len(), indexing, slicing, head(n), take(row_ids) and sample(n)
+        """
+        return self.open_mapped(self.csv_path(dataset_name, dataset_type))
+
+    def get_profile(self, dataset_name, dataset_type='sample'):
+        """
+        Get the column profile of a split, computing it if it was not loaded with the data.
+
+        Args:
+            dataset_name (str): The competition dataset folder name
+            dataset_type (str): Either 'sample' or 'all' (default: 'sample')
+
+        Returns:
+            dict: Profile with 'num_rows' and one entry per column (see profile_rows)
+        """
+        entry = self.data.get(dataset_name, {})
+        if f'{dataset_type}_profile' in entry:
+            return entry[f'{dataset_type}_profile']
+        if self.competition_dir is not None:
+            profiler = self.profiler or ColumnProfiler(self.cache)
+            profile = profiler.profile(self.csv_path(dataset_name, dataset_type))
+        elif dataset_type in entry:
+            profile = profile_rows(entry[dataset_type])
+        else:
+            raise FileNotFoundError(f"Dataset {dataset_name}/{dataset_type}.csv not found.")
+        entry[f'{dataset_type}_profile'] = profile
+        return profile
+
+    def publish_shared(self):
+        """
+        Publish the loaded datasets to shared memory for other processes.
+
+        Returns:
+            tuple: (store, manifest). Keep the SharedDataStore alive while workers use the
+            data and call store.close() afterwards; pass the manifest to attach_shared().
+        """
+        from agents.shared_store import SharedDataStore
+        store = SharedDataStore()
+        return store, store.publish(self.data)
+
+    def attach_shared(self, manifest):
+        """
+        Use datasets published by another process instead of loading them from disk.
+
+        The splits become read-only MappedCSV views over the shared memory.
+
+        Args:
+            manifest (dict): Manifest returned by publish_shared()
+        """
+        from agents.shared_store import SharedDataStore
+        self.data = SharedDataStore.attach(manifest)
+
+    def iter_rows(self, dataset_name, dataset_type='all', include_header=False):
+        """
+        Stream the rows of a split from disk one at a time, in bounded memory.
+
+        Args:
+            dataset_name (str): The competition dataset folder name
+            dataset_type (str): Either 'sample' or 'all' (default: 'all')
+            include_header (bool): If True, the column names are yielded first
+
+        Yields:
+            list: One CSV row at a time
+        """
+        with open(self.csv_path(dataset_name, dataset_type), 'r') as csv_file:
+            reader = csv.reader(csv_file)
+            header = next(reader, None)
+            if include_header and header is not None:
+                yield header
+            yield from reader
+
+    def iter_chunks(self, dataset_name, dataset_type='all', chunk_rows=10000):
+        """
+        Stream the data rows of a split from disk in lists of at most chunk_rows rows.
+
+        The column names are not part of the chunks; they are available as
+        self.data[dataset_name][f'{dataset_type}_column_names'], e.g. to build
+        pd.DataFrame(chunk, columns=column_names) for each chunk.
+
+        Args:
+            dataset_name (str): The competition dataset folder name
+            dataset_type (str): Either 'sample' or 'all' (default: 'all')
+            chunk_rows (int): Maximum number of rows per chunk
+
+        Yields:
+            list: A list of CSV rows
+        """
+        chunk = []
+        for row in self.iter_rows(dataset_name, dataset_type):
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def read_header(self, csv_path, stats=None):
+        """
+        Read only the column names of a CSV file.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            stats (dict, optional): Its 'bytes' entry is increased by the size of the header
+
+        Returns:
+            list: Column names, or empty list if the file is empty
+        """
+        with open(csv_path, 'r') as csv_file:
+            lines = []
+
+            def header_lines():
+                # The header may span several lines when a quoted name contains a newline
+                for line in csv_file:
+                    lines.append(line)
+                    yield line
+
+            header = next(csv.reader(header_lines()), [])
+        if stats is not None:
+            stats['bytes'] += sum(len(line.encode('utf-8')) for line in lines)
+        return header
+
+    def load_split(self, folder_name, split):
+        """
+        Read a split of a lazily loaded dataset from disk and store it in self.data.
+
+        Args:
+            folder_name (str): Name of the competition folder
+            split (str): Either 'sample' or 'all'
+
+        Returns:
+            list: The rows of the split
+        """
+        with self._lock:
+            entry = self.data[folder_name]
+            if dict.__contains__(entry, split):
+                return dict.__getitem__(entry, split)
+            split_data = self.read_split(entry.csv_paths[split], split)
+            entry[split] = split_data
+            if split == 'all':
+                self._loaded[(folder_name, split)] = entry
+                self._evict()
+            return split_data
+
+    def touch_split(self, folder_name, split):
+        """Mark a lazily loaded split as recently used."""
+        with self._lock:
+            if (folder_name, split) in self._loaded:
+                self._loaded.move_to_end((folder_name, split))
+
+    def _evict(self):
+        """Drop the least recently used 'all' splits until at most max_loaded remain."""
+        if self.max_loaded is None:
+            return
+        while len(self._loaded) > self.max_loaded:
+            (folder_name, split), entry = self._loaded.popitem(last=False)
+            dict.pop(entry, split, None)
+
     def print_dictionary_keys(self, d, indent=0):
         """
         Recursively print all keys in a nested dictionary structure.
@@ -93,14 +507,31 @@ if __name__ == "__main__":
     parser.add_argument('--data-dir', type=str, 
                         default=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'competition'),
                         help='Path to the competition directory (default: ../competition)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of competition folders to parse concurrently')
+    parser.add_argument('--processes', action='store_true',
+                        help='Use a process pool instead of a thread pool with --workers')
+    parser.add_argument('--lazy', action='store_true',
+                        help='Only read each split from disk the first time it is used')
+    parser.add_argument('--columnar', action='store_true',
+                        help='Store each split as typed columns instead of lists of strings')
+    parser.add_argument('--cache', action='store_true',
+                        help='Cache the typed columns of columnar splits as Parquet next to the CSV files')
+    parser.add_argument('--mapped', action='store_true',
+                        help='Memory-map all.csv files with a persisted row-offset index')
+    parser.add_argument('--profiles', action='store_true',
+                        help='Compute and store a profile of every column next to each CSV')
+    parser.add_argument('--max-loaded', type=int, default=None,
+                        help='In lazy mode, maximum number of full datasets kept in memory')
     
     args = parser.parse_args()
     
-    agent = DataAgent()
+    agent = DataAgent(lazy=args.lazy, max_loaded=args.max_loaded, columnar=args.columnar,
+                      cache=args.cache, mapped=args.mapped, profiles=args.profiles)
     competition_directory = args.data_dir
     
     print(f"Attempting to load data from: {competition_directory}")
-    success = agent.load_data(competition_directory)
+    success = agent.load_data(competition_directory, workers=args.workers, use_processes=args.processes)
     
     if success:
         print("\nAll dictionary keys:")
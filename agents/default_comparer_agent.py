@@ -1,6 +1,5 @@
 import os
 import sys
-from databench_eval import Evaluator
 """
 This module provides a DefaultComparer class that compares model responses to actual answers
 using a default comparison method provided by the Evaluator class from the databench_eval module.
@@ -21,6 +20,7 @@ Usage:
 
 class DefaultComparer:
     def __init__(self):
+        from databench_eval import Evaluator
         self.evaluator = Evaluator()
         self.file_path = None
         self.answers_lite = "answers/answers_lite.txt"
@@ -1,10 +1,10 @@
-from databench_eval import Runner, Evaluator
-from databench_eval.utils import load_qa
 import os
 import sys
 
 import csv
 import json
+import asyncio
+import contextlib
 from tqdm import tqdm
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -12,20 +12,175 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dotenv import load_dotenv
 load_dotenv()  # Load environment variables from .env file
 
+from agents.batch_mode import BatchCollector, DeferredRequest, read_batch_results
+from agents.checkpoint import CheckpointJournal, FailedResponse
+from agents.http_pool import default_client_pool
+from agents.response_writer import ResponseWriter
+from agents.telemetry import phase, record_outcome
+from agents.answer_compare import default_compare
+
+ANSWERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'answers')
+
+
+def shard_datasets(prompts, num_shards):
+    """
+    Split prompts into shards made of whole datasets, balanced by number of questions.
+
+    Datasets are assigned largest first to the shard with the fewest questions so far,
+    ties going to the dataset seen first and the lowest shard, so the split only
+    depends on the prompts.
+
+    Args:
+        prompts: List of prompts with a 'dataset' key
+        num_shards: Maximum number of shards
+
+    Returns:
+        List of non-empty lists of indices into prompts, each in the original order
+    """
+    by_dataset = {}
+    for i, prompt in enumerate(prompts):
+        by_dataset.setdefault(prompt['dataset'], []).append(i)
+    shards = [[] for _ in range(max(1, min(num_shards, len(by_dataset))))]
+    for indices in sorted(by_dataset.values(), key=lambda indices: (-len(indices), indices[0])):
+        min(shards, key=len).extend(indices)
+    return [sorted(shard) for shard in shards if shard]
+
+
+def shard_llm_options(llm, num_shards):
+    """
+    Picklable settings from which every worker of a sharded run rebuilds an LLMClient.
+
+    The workers use the same response cache file as llm and split its rate limits
+    evenly, so that together they stay within the limits.
+
+    Args:
+        llm: LLMClient of the parent process
+        num_shards: Number of worker processes
+
+    Returns:
+        dict: Settings for shard_llm
+    """
+    limiter = llm.limiter
+    return {
+        'api_key': llm.api_key,
+        'base_url': llm.base_url,
+        'cache_path': llm.cache.path if llm.cache is not None else None,
+        'cache_max_bytes': llm.cache.max_bytes if llm.cache is not None else None,
+        'requests_per_minute': limiter.request_bucket.rate / num_shards if limiter.request_bucket else None,
+        'tokens_per_minute': limiter.token_bucket.rate / num_shards if limiter.token_bucket else None,
+        'max_retries': limiter.max_retries,
+        'base_delay': limiter.base_delay,
+        'max_delay': limiter.max_delay,
+    }
+
+
+def shard_llm(options):
+    """
+    Build a worker's LLMClient from shard_llm_options.
+
+    Args:
+        options: Settings returned by shard_llm_options
+
+    Returns:
+        LLMClient: Client with its own ResponseCache connection (if the parent had a cache)
+        and its own RateLimiter
+    """
+    from agents.llm_client import LLMClient
+    from agents.rate_limiter import RateLimiter
+    from agents.response_cache import ResponseCache
+    cache = None
+    if options['cache_path'] is not None:
+        cache = ResponseCache(options['cache_path'], options['cache_max_bytes'])
+    limiter = RateLimiter(options['requests_per_minute'], options['tokens_per_minute'],
+                          max_retries=options['max_retries'], base_delay=options['base_delay'],
+                          max_delay=options['max_delay'])
+    return LLMClient(api_key=options['api_key'], base_url=options['base_url'], cache=cache, limiter=limiter)
+
+
+def evaluate_shard(model_class, model_kwargs, manifest, prompts, journal_path, resume=False, concurrency=None,
+                   llm_options=None, telemetry_options=None):
+    """
+    Answer one shard of the questions in a worker process.
+
+    Args:
+        model_class: Model class, instantiated in the worker
+        model_kwargs: Keyword arguments for the model
+        manifest: Shared memory manifest of the datasets (see DataAgent.publish_shared),
+            or None to let the model load the competition data itself
+        prompts: Prompts of the shard, with their 'qa_index'
+        journal_path: Checkpoint journal of this shard
+        resume: Append to the shard's journal instead of starting a new one
+        concurrency: If set, answer up to this many questions at once
+        llm_options: Settings of the model's LLMClient (see shard_llm_options)
+        telemetry_options: Keyword arguments of the shard's Telemetry, or None for no telemetry
+
+    Returns:
+        List of responses, in the order of prompts
+    """
+    from agents.shared_store import SharedDataStore
+    from agents.telemetry import Telemetry
+    data = SharedDataStore.attach(manifest) if manifest is not None else None
+    journal = CheckpointJournal(journal_path)
+    journal.open(resume=resume)
+    llm = shard_llm(llm_options) if llm_options is not None else None
+    telemetry = Telemetry(**telemetry_options) if telemetry_options is not None else None
+    try:
+        if llm is not None:
+            model_kwargs = dict(model_kwargs, llm=llm)
+        agent = EvalAgent(model=model_class(data=data, **model_kwargs), telemetry=telemetry)
+
+        def record(prompt, response):
+            journal.record(prompt['qa_index'], prompt['question'], response)
+
+        if concurrency:
+            return agent.model_call_async(prompts, concurrency=concurrency, on_response=record)
+        return agent.model_call(prompts, on_response=record)
+    finally:
+        journal.close()
+        if telemetry is not None:
+            telemetry.close()
+        if llm is not None and llm.cache is not None:
+            llm.cache.close()
+        if data is not None:
+            SharedDataStore.detach(data)
+
 
 class EvalAgent:
-    def __init__(self):
+    def __init__(self, model=None, telemetry=None):
+        """
+        Args:
+            model: Default model to evaluate (a ZeroShotModelICL if None)
+            telemetry (Telemetry, optional): Sink receiving one event per answered question
+                (latency per phase, tokens, retries, cost and outcome)
+        """
         self.api_key = os.getenv("OPENAI_API_KEY")
-        from models.zero_shot_incontext_learning import ZeroShotModelICL
-        self.model = ZeroShotModelICL(api_key=self.api_key)
+        if model is None:
+            from models.zero_shot_incontext_learning import ZeroShotModelICL
+            model = ZeroShotModelICL(api_key=self.api_key)
+        self.model = model
+        self.telemetry = telemetry
+
+    def track(self, model, dataset, question_index=None):
+        """
+        Telemetry event of a question while it is answered, or a no-op without telemetry.
+
+        Args:
+            model: Model answering the question; its class name is the event's strategy
+            dataset: Dataset of the question
+            question_index: Index of the question in the test QA file
+        """
+        if self.telemetry is None:
+            return contextlib.nullcontext()
+        return self.telemetry.question(type(model).__name__, dataset, question_index)
     
-    def model_call(self, prompts: list[str], model=None) -> list[str]:
+    def model_call(self, prompts: list[str], model=None, on_response=None) -> list[str]:
         """ 
         Call model on a batch of prompts.
         
         Args:
             prompts: List of prompts to process
             model: Model instance with ask_question method (uses self.model if None)
+            on_response: Called with (prompt, response) as soon as each response is known
         """
         if model is None:
             model = self.model
@@ -34,20 +189,157 @@ class EvalAgent:
         for prompt in prompts:
             question = prompt['question']
             dataset = prompt['dataset']
-            response = model.ask_question(dataset, question)
-            try:
-                response_json = json.loads(response)
-                print(response_json)
-        
-                if "answer" in response_json:
-                    responses.append(response_json["answer"])
+            with self.track(model, dataset, prompt.get('qa_index')):
+                raw = model.ask_question(dataset, question)
+                record_outcome(raw)
+                with phase('parse'):
+                    response = self.parse_response(raw)
+            if on_response:
+                on_response(prompt, response)
+            responses.append(response)
+        return responses
+
+    def model_call_batched(self, prompts: list[str], model=None, on_response=None) -> list[str]:
+        """
+        Call model on a batch of prompts, asking all the questions about a dataset together.
+
+        Args:
+            prompts: List of prompts to process
+            model: Model instance with ask_questions method (uses self.model if None)
+            on_response: Called with (prompt, response) as soon as each response is known
+
+        Returns:
+            List of responses, in the same order as prompts. The questions of a dataset whose
+            call failed get a FailedResponse, so that resume asks them again.
+        """
+        if model is None:
+            model = self.model
+
+        by_dataset = {}
+        for i, prompt in enumerate(prompts):
+            by_dataset.setdefault(prompt['dataset'], []).append(i)
+
+        responses = [None] * len(prompts)
+        for dataset, indices in by_dataset.items():
+            # One event for the questions asked together
+            with self.track(model, dataset, [prompts[i].get('qa_index') for i in indices]):
+                try:
+                    answers = model.ask_questions(dataset, [prompts[i]['question'] for i in indices])
+                except DeferredRequest:
+                    raise
+                except Exception as e:
+                    print(f"Request failed for {dataset}: {e}")
+                    record_outcome(error=e)
+                    for i in indices:
+                        responses[i] = FailedResponse(f"Request failed: {e}")
                 else:
-                    responses.append("ERROR") 
-            except json.JSONDecodeError as e:
-                print(f"Failed to decode JSON response: {e}")
-                responses.append(f"Failed to decode JSON response: {e}")
+                    with phase('parse'):
+                        for i, response in zip(indices, answers):
+                            record_outcome(response)
+                            responses[i] = self.parse_response(response)
+            if on_response:
+                for i in indices:
+                    on_response(prompts[i], responses[i])
         return responses
 
+    def model_call_async(self, prompts: list[str], model=None, concurrency=10, on_response=None) -> list[str]:
+        """
+        Call model on a batch of prompts with up to `concurrency` requests in flight at once.
+
+        Args:
+            prompts: List of prompts to process
+            model: Model instance with ask_question_async method (uses self.model if None)
+            concurrency: Maximum number of questions being answered at the same time
+            on_response: Called with (prompt, response) as soon as each response is known
+
+        Returns:
+            List of responses, in the same order as prompts
+        """
+        if model is None:
+            model = self.model
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(concurrency)
+            try:
+                # gather returns the results in the order of the prompts, whatever order they finish in
+                return await asyncio.gather(*(self.answer_async(model, prompt, semaphore, on_response)
+                                              for prompt in prompts))
+            finally:
+                await default_client_pool.aclose_async()
+
+        return asyncio.run(run_all())
+
+    async def answer_async(self, model, prompt, semaphore, on_response=None):
+        """
+        Answer one prompt with a model's ask_question_async once the semaphore allows it.
+
+        Args:
+            model: Model instance with ask_question_async method
+            prompt: Prompt to answer
+            semaphore: asyncio.Semaphore limiting the questions being answered at the same time
+            on_response: Called with (prompt, response) as soon as the response is known
+
+        Returns:
+            The parsed response, or a FailedResponse if the request failed
+        """
+        async with semaphore:
+            with self.track(model, prompt['dataset'], prompt.get('qa_index')):
+                try:
+                    raw = await model.ask_question_async(prompt['dataset'], prompt['question'])
+                    record_outcome(raw)
+                    with phase('parse'):
+                        response = self.parse_response(raw)
+                except Exception as e:
+                    print(f"Request failed for {prompt['dataset']}: {e}")
+                    record_outcome(error=e)
+                    # Journaled as failed, so that resume asks the question again
+                    response = FailedResponse(f"Request failed: {e}")
+            if on_response:
+                on_response(prompt, response)
+            return response
+
+    def answer_prompts(self, prompts, model=None, concurrency=None, batch_questions=False, on_response=None):
+        """
+        Answer prompts with the call path selected by evaluate()'s options.
+
+        Args:
+            prompts: List of prompts to process
+            model: Model to use (uses self.model if None)
+            concurrency: If set, use model_call_async with up to this many questions at once
+            batch_questions: Use model_call_batched
+            on_response: Called with (prompt, response) as soon as each response is known
+
+        Returns:
+            List of responses, in the same order as prompts
+        """
+        if batch_questions:
+            return self.model_call_batched(prompts, model, on_response=on_response)
+        if concurrency:
+            return self.model_call_async(prompts, model, concurrency, on_response=on_response)
+        return self.model_call(prompts, model, on_response=on_response)
+
+    def parse_response(self, response):
+        """
+        Extract the answer from a model's JSON response.
+
+        Args:
+            response: Raw response returned by the model
+
+        Returns:
+            The answer, or an error message if the response has none
+        """
+        try:
+            response_json = json.loads(response)
+            print(response_json)
+
+            if "answer" in response_json:
+                return response_json["answer"]
+            else:
+                return "ERROR"
+        except json.JSONDecodeError as e:
+            print(f"Failed to decode JSON response: {e}")
+            return f"Failed to decode JSON response: {e}"
+
     def load_test_qa(self, filepath='competition/test_qa.csv'):
         """
         Load test questions and datasets from a CSV file.
@@ -94,7 +386,96 @@ class EvalAgent:
             
         return responses
         
-    def evaluate(self, test_qa_path='../competition/test_qa.csv', save_path="responses.txt", model=None):
+    def emit_batch(self, test_qa_path='../competition/test_qa.csv', batch_path="batch_requests.jsonl", model=None):
+        """
+        Write every request a model needs to answer the test questions as an OpenAI Batch API input file,
+        without calling the API.
+
+        Requests already in the model's response cache are not written. Models that ask several
+        questions in a row (CoT) need a new round for each step: emit, ingest, emit again...
+
+        Args:
+            test_qa_path: Path to the test QA file
+            batch_path: Path of the JSONL batch file to write
+            model: Model to use (uses self.model if None)
+
+        Returns:
+            Number of requests written; 0 means every question can be answered from the cache
+        """
+        if model is None:
+            model = self.model
+
+        collector = BatchCollector()
+        model.llm.batch = collector
+        try:
+            for prompt in self.load_test_qa(test_qa_path):
+                try:
+                    model.ask_question(prompt['dataset'], prompt['question'])
+                except DeferredRequest:
+                    pass
+        finally:
+            model.llm.batch = None
+
+        if len(collector):
+            collector.write(batch_path)
+            print(f"Wrote {len(collector)} requests to {batch_path}")
+        return len(collector)
+
+    def ingest_batch(self, results_path, test_qa_path='../competition/test_qa.csv', save_path="responses.txt",
+                     model=None, batch_path="batch_requests.jsonl", answers_dir=ANSWERS_DIR):
+        """
+        Store the results of a batch in the model's response cache, then either write the
+        responses file or, if some questions still need requests, the next batch file.
+
+        Args:
+            results_path: Batch API output file (or one written by LocalBatchRunner)
+            test_qa_path: Path to the test QA file
+            save_path: Path to save responses
+            model: Model to use (uses self.model if None); its LLMClient needs a ResponseCache
+            batch_path: Path of the next batch file, if one is needed
+            answers_dir: Directory with the true answers (see score)
+
+        Returns:
+            The result of evaluate(), or None if another batch round is needed
+        """
+        if model is None:
+            model = self.model
+        if model.llm.cache is None:
+            raise ValueError("Batch results are stored in the response cache; use a model whose LLMClient has one.")
+
+        stored = 0
+        for custom_id, model_name, content in read_batch_results(results_path):
+            if content is not None:
+                model.llm.cache.put_key(custom_id, model_name, content)
+                stored += 1
+        print(f"Stored {stored} batch results")
+
+        if self.emit_batch(test_qa_path, batch_path, model):
+            print(f"Submit {batch_path} and ingest its results to continue")
+            return None
+        return self.evaluate(test_qa_path, save_path, model, answers_dir=answers_dir)
+
+    def dataset_order(self, prompts):
+        """
+        Order prompts so that all questions about a dataset run back to back.
+
+        Datasets keep the order in which they first appear, and questions keep their
+        order within a dataset.
+
+        Args:
+            prompts: List of prompts with a 'dataset' key
+
+        Returns:
+            List of indices into prompts
+        """
+        first_seen = {}
+        for prompt in prompts:
+            first_seen.setdefault(prompt['dataset'], len(first_seen))
+        return sorted(range(len(prompts)), key=lambda i: (first_seen[prompts[i]['dataset']], i))
+
+    def evaluate(self, test_qa_path='../competition/test_qa.csv', save_path="responses.txt", model=None,
+                 group_by_dataset=False, concurrency=None, batch_questions=False, resume=False,
+                 checkpoint_path=None, answers_dir=ANSWERS_DIR):
         """
         Run evaluation on the test dataset and print metrics
         
@@ -102,37 +483,337 @@ class EvalAgent:
             test_qa_path: Path to the test QA file
             save_path: Path to save responses
             model: Model to use (uses self.model if None)
+            group_by_dataset: Ask all questions about a dataset consecutively, so that models using
+                prompt_layout="prefix" hit the API's prompt cache. Responses are saved in the original order.
+            concurrency: If set, send up to this many requests at once through the model's
+                ask_question_async instead of asking the questions one by one
+            batch_questions: Ask all the questions about a dataset in one call through the model's
+                ask_questions (prompt-based models only)
+            resume: Skip the questions already answered in the checkpoint journal of an interrupted run
+            checkpoint_path: Journal where each answer is recorded as soon as it is known
+                (default: save_path + ".checkpoint.jsonl")
+            answers_dir: Directory with the true answers (see score)
         """
         print("Loading test data...")
         test_qa = self.load_test_qa(test_qa_path)
+        order = self.dataset_order(test_qa) if group_by_dataset else list(range(len(test_qa)))
 
+        journal = CheckpointJournal(checkpoint_path or f"{save_path}.checkpoint.jsonl")
+        done = journal.load(test_qa) if resume else {}
+        if done:
+            print(f"Resuming: {len(done)} of {len(test_qa)} questions already answered")
+        scheduled_qa = [dict(test_qa[i], qa_index=i) for i in order if i not in done]
+
+        def record(prompt, response):
+            journal.record(prompt['qa_index'], prompt['question'], response)
+
+        from databench_eval import Runner
         from datasets import Dataset
         import pandas as pd
         
-        # Convert test_qa to a Dataset object
-        df = pd.DataFrame(test_qa)
-        qa_dataset = Dataset.from_pandas(df)
-        
         # Create a wrapper function that shows progress
         def model_call_with_progress(prompts):
             print(f"Processing batch of {len(prompts)} prompts...")
-            return self.model_call(prompts, model)
+            return self.answer_prompts(prompts, model, concurrency, batch_questions, on_response=record)
         
-        print("Running evaluation...")
-        # Now use Runner with this dataset
-        responses = Runner(model_call_with_progress, qa=qa_dataset).run(test_qa, save=save_path)
+        responses = [None] * len(test_qa)
+        for i, response in done.items():
+            responses[i] = response
 
-        print("Reading responses...")
-        # Read the responses from the saved file with tqdm
-        responses = []
-        with open(save_path, "r", encoding="utf-8") as file:
-            lines = file.readlines()
-            for line in tqdm(lines, desc="Processing responses"):
-                responses.append(line.strip())
+        journal.open(resume=resume)
+        try:
+            if scheduled_qa:
+                # Convert test_qa to a Dataset object
+                df = pd.DataFrame(scheduled_qa)
+                qa_dataset = Dataset.from_pandas(df)
+
+                print("Running evaluation...")
+                # Now use Runner with this dataset. With concurrency, a single batch lets the semaphore
+                # keep requests in flight instead of waiting for the slowest question of every batch.
+                # With batch_questions, it keeps every dataset's questions in the same call.
+                batch_size = max(1, len(scheduled_qa)) if concurrency or batch_questions else 10
+                runner = Runner(model_call_with_progress, qa=qa_dataset, batch_size=batch_size)
+                scheduled_responses = runner.run(scheduled_qa)
+                (model or self.model).llm.limiter.print_metrics()
+
+                for prompt, response in zip(scheduled_qa, scheduled_responses):
+                    responses[prompt['qa_index']] = response
+        finally:
+            journal.close()
+
+        return self.save_and_score(responses, save_path, answers_dir)
+
+    def evaluate_native(self, test_qa_path='../competition/test_qa.csv', save_path=None, model=None,
+                        group_by_dataset=False, concurrency=None, batch_questions=False, resume=False,
+                        checkpoint_path=None, answers_dir=ANSWERS_DIR):
+        """
+        Run evaluation from the question list to the scores in memory and print metrics.
+
+        Takes the same options as evaluate() but skips the DataFrame / Dataset / Runner round trip
+        and streams the responses file instead of writing it at the end. Scored like evaluate()
+        (see score).
+
+        Args:
+            test_qa_path: Path to the test QA file
+            save_path: If set, responses are streamed to this file as they arrive, in question order
+            model: Model to use (uses self.model if None)
+            group_by_dataset: Ask all questions about a dataset consecutively (see evaluate)
+            concurrency: If set, send up to this many requests at once through ask_question_async
+            batch_questions: Ask all the questions about a dataset in one call through ask_questions
+            resume: Skip the questions already answered in the checkpoint journal of an interrupted run
+            checkpoint_path: Journal where each answer is recorded as soon as it is known
+                (default: save_path + ".checkpoint.jsonl"; no journal without either)
+            answers_dir: Directory with answers.txt, answers_lite.txt and semantics.txt, one line per question
+
+        Returns:
+            Accuracy, lite accuracy and the responses
+        """
+        print("Loading test data...")
+        test_qa = self.load_test_qa(test_qa_path)
+        order = self.dataset_order(test_qa) if group_by_dataset else list(range(len(test_qa)))
+
+        checkpoint_path = checkpoint_path or (f"{save_path}.checkpoint.jsonl" if save_path else None)
+        journal = CheckpointJournal(checkpoint_path) if checkpoint_path else None
+        done = journal.load(test_qa) if journal and resume else {}
+        if done:
+            print(f"Resuming: {len(done)} of {len(test_qa)} questions already answered")
+        scheduled_qa = [dict(test_qa[i], qa_index=i) for i in order if i not in done]
+
+        responses = [None] * len(test_qa)
+        writer = ResponseWriter(save_path, len(test_qa)) if save_path else None
+        for i, response in done.items():
+            responses[i] = response
+            if writer:
+                writer.add(i, response)
+
+        progress = tqdm(total=len(scheduled_qa), desc="Answering")
+
+        def record(prompt, response):
+            responses[prompt['qa_index']] = response
+            if journal:
+                journal.record(prompt['qa_index'], prompt['question'], response)
+            if writer:
+                writer.add(prompt['qa_index'], response)
+            progress.update()
+
+        if journal:
+            journal.open(resume=resume)
+        try:
+            if scheduled_qa:
+                print("Running evaluation...")
+                self.answer_prompts(scheduled_qa, model, concurrency, batch_questions, on_response=record)
+                (model or self.model).llm.limiter.print_metrics()
+        finally:
+            progress.close()
+            if journal:
+                journal.close()
+            if writer:
+                writer.close()
 
         print("Calculating metrics...")
-        acc = Evaluator().eval(responses)
-        acc_lite = Evaluator().eval(responses, lite=True)
+        acc, acc_lite = self.score(responses, answers_dir)
+        print(f"Accuracy: {acc}")
+        print(f"Lite accuracy: {acc_lite}")
+        if save_path:
+            print(f"Responses saved to {save_path}")
+        return acc, acc_lite, responses
+
+    def evaluate_sharded(self, model_class, model_kwargs=None, test_qa_path='../competition/test_qa.csv',
+                         save_path="responses.txt", workers=4, data=None, resume=False, checkpoint_path=None,
+                         concurrency=None, llm=None, answers_dir=ANSWERS_DIR):
+        """
+        Run evaluation in several worker processes, each answering the questions of whole datasets
+        with its own model instance, then merge the responses in the original order and print metrics.
+
+        Useful for CodeBasedModel, whose generated code runs on the CPU and holds the GIL.
+
+        Args:
+            model_class: Model class to instantiate in every worker (e.g. CodeBasedModel)
+            model_kwargs: Keyword arguments for the model, which must be picklable
+            test_qa_path: Path to the test QA file
+            save_path: Path to save responses
+            workers: Number of worker processes (and at most as many shards)
+            data: Datasets as stored in DataAgent.data, shared with the workers through shared memory.
+                If None, every worker's model loads the competition data itself.
+            resume: Skip the questions already answered in the checkpoint journals of an interrupted run
+            checkpoint_path: Base path of the journals; each shard writes its own (default:
+                save_path + ".checkpoint.jsonl", shards add ".shard<N>")
+            concurrency: If set, each worker answers up to this many questions at once
+            llm: LLMClient whose response cache and rate limits the workers use, each with an
+                equal share of the limits (see shard_llm_options). If None, a client for the
+                model's api_key and base_url with the process-wide limiter's limits and no cache.
+                With telemetry, each worker writes its events next to the telemetry file and
+                they are appended to it when the workers are done.
+            answers_dir: Directory with the true answers (see score)
+        """
+        import glob
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from agents.shared_store import SharedDataStore
+
+        print("Loading test data...")
+        test_qa = self.load_test_qa(test_qa_path)
+        checkpoint_path = checkpoint_path or f"{save_path}.checkpoint.jsonl"
+        journal_paths = [checkpoint_path] + sorted(glob.glob(f"{glob.escape(checkpoint_path)}.shard*"))
+
+        done = {}
+        if resume:
+            for path in journal_paths:
+                done.update(CheckpointJournal(path).load(test_qa))
+            print(f"Resuming: {len(done)} of {len(test_qa)} questions already answered")
+        else:
+            for path in journal_paths[1:]:
+                os.remove(path)
+
+        pending = [dict(test_qa[i], qa_index=i) for i in range(len(test_qa)) if i not in done]
+        shards = [[pending[i] for i in shard] for shard in shard_datasets(pending, workers)]
+        # Shard numbers of an earlier run may still have journals; use new ones
+        first_shard = len(journal_paths) - 1 if resume else 0
+
+        responses = [None] * len(test_qa)
+        for i, response in done.items():
+            responses[i] = response
+
+        model_kwargs = model_kwargs or {}
+        if llm is None:
+            from agents.llm_client import LLMClient
+            llm = LLMClient(api_key=model_kwargs.get('api_key') or self.api_key,
+                            base_url=model_kwargs.get('base_url'))
+        llm_options = shard_llm_options(llm, max(1, len(shards)))
+        telemetry_paths = [None] * len(shards)
+        if self.telemetry is not None:
+            telemetry_paths = [f"{self.telemetry.path}.shard{first_shard + number}" for number in range(len(shards))]
+
+        store, manifest = None, None
+        if data is not None and shards:
+            store = SharedDataStore()
+            manifest = store.publish(data)
+        try:
+            if shards:
+                print(f"Running evaluation in {len(shards)} worker processes...")
+                # Fresh interpreters: forked workers would inherit this process's open HTTP connections
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=len(shards), mp_context=context) as executor:
+                    futures = [
+                        executor.submit(evaluate_shard, model_class, model_kwargs, manifest, shard,
+                                        f"{checkpoint_path}.shard{first_shard + number}", resume, concurrency,
+                                        llm_options,
+                                        {'path': telemetry_path, 'prices': self.telemetry.prices}
+                                        if telemetry_path else None)
+                        for number, (shard, telemetry_path) in enumerate(zip(shards, telemetry_paths))
+                    ]
+                    for shard, future in zip(shards, tqdm(futures, desc="Shards")):
+                        for prompt, response in zip(shard, future.result()):
+                            responses[prompt['qa_index']] = response
+        finally:
+            if store is not None:
+                store.close()
+            self.merge_telemetry(telemetry_paths)
+
+        return self.save_and_score(responses, save_path, answers_dir)
+
+    def merge_telemetry(self, paths):
+        """
+        Append the events written by worker processes to this agent's telemetry file.
+
+        Args:
+            paths: Telemetry files of the workers (None entries are skipped); they are deleted
+        """
+        from agents.telemetry import read_events
+        for path in paths:
+            if path is None or not os.path.exists(path):
+                continue
+            for event in read_events(path):
+                self.telemetry.write(event)
+            os.remove(path)
+
+    def evaluate_models(self, models, test_qa_path='../competition/test_qa.csv', concurrency=10, resume=False,
+                        answers_dir=ANSWERS_DIR):
+        """
+        Evaluate several models in one pass over the test questions, with their requests
+        interleaved under a single concurrency limit, and save one responses file per model.
+
+        The models should share their data (the same DataAgent.data) and LLMClient; they always
+        share the process-wide rendered-prompt cache and connection pool. The run takes about
+        as long as the slowest model instead of the sum of all of them.
+
+        Args:
+            models: Dictionary mapping each responses file path to the model to evaluate
+            test_qa_path: Path to the test QA file
+            concurrency: Maximum number of questions being answered at the same time, over all models
+            resume: Skip the questions already answered in each model's checkpoint journal
+            answers_dir: Directory with the true answers (see score)
+
+        Returns:
+            Dictionary mapping each responses file path to what evaluate() returns for it
+        """
+        print("Loading test data...")
+        test_qa = self.load_test_qa(test_qa_path)
+
+        runs = []
+        for save_path, model in models.items():
+            journal = CheckpointJournal(f"{save_path}.checkpoint.jsonl")
+            done = journal.load(test_qa) if resume else {}
+            responses = [None] * len(test_qa)
+            for i, response in done.items():
+                responses[i] = response
+            runs.append((save_path, model, journal, done, responses))
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(concurrency)
+            tasks = []
+            # Question by question, so every model makes progress at the same pace
+            for i, prompt in enumerate(test_qa):
+                prompt = dict(prompt, qa_index=i)
+                for save_path, model, journal, done, responses in runs:
+                    if i in done:
+                        continue
+
+                    def record(prompt, response, journal=journal, responses=responses):
+                        responses[prompt['qa_index']] = response
+                        journal.record(prompt['qa_index'], prompt['question'], response)
+
+                    tasks.append(self.answer_async(model, prompt, semaphore, record))
+            print(f"Running {len(tasks)} questions over {len(runs)} models...")
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                await default_client_pool.aclose_async()
+
+        for _, _, journal, _, _ in runs:
+            journal.open(resume=resume)
+        try:
+            asyncio.run(run_all())
+        finally:
+            for _, _, journal, _, _ in runs:
+                journal.close()
+
+        results = {}
+        for save_path, model, _, _, responses in runs:
+            print(f"Scoring {save_path}...")
+            results[save_path] = self.save_and_score(responses, save_path, answers_dir)
+        return results
+
+    def save_and_score(self, responses, save_path, answers_dir=ANSWERS_DIR):
+        """
+        Save responses, one per line in question order, and print their accuracy.
+
+        Args:
+            responses: Responses in the order of the test questions
+            save_path: Path to save responses
+            answers_dir: Directory with the true answers (see score)
+
+        Returns:
+            Accuracy, lite accuracy and the responses as written to the file
+        """
+        # Same format as Runner.save_responses
+        with open(save_path, "w") as f:
+            for response in responses:
+                f.write(str(response) + "\n")
+        responses = [str(response).strip() for response in responses]
+
+        print("Calculating metrics...")
+        acc, acc_lite = self.score(responses, answers_dir)
 
         print(f"Accuracy: {acc}")
         print(f"Lite accuracy: {acc_lite}")
@@ -140,6 +821,38 @@ class EvalAgent:
         
         return acc, acc_lite, responses
 
+    def score(self, responses, answers_dir=ANSWERS_DIR, compare=None):
+        """
+        Compute the accuracy and lite accuracy of responses in a single pass.
+
+        Every evaluation path scores here, against the competition's true answers in
+        answers/ (the ones DefaultComparer and main.py use), so they all report the same
+        accuracy for the same responses.
+
+        Args:
+            responses: Responses in the order of the test questions
+            answers_dir: Directory with answers.txt, answers_lite.txt and semantics.txt, one line per question
+            compare: Function (response, truth, semantic) -> bool (databench_eval's comparison rules if None)
+
+        Returns:
+            Accuracy and lite accuracy
+        """
+        compare = compare or default_compare
+
+        columns = []
+        for name in ('answers.txt', 'answers_lite.txt', 'semantics.txt'):
+            with open(os.path.join(answers_dir, name), 'r', encoding='utf-8') as f:
+                columns.append(f.read().splitlines())
+        truths, truths_lite, semantics = columns
+
+        correct = correct_lite = 0
+        for response, truth, truth_lite, semantic in zip(responses, truths, truths_lite, semantics):
+            # As written to and read back from the responses file
+            value = str(response).strip()
+            correct += compare(value, truth, semantic)
+            correct_lite += compare(value, truth_lite, semantic)
+        return correct / len(truths), correct_lite / len(truths_lite)
+
 
 def main():
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -151,7 +864,11 @@ def main():
     data_agent.load_data(competition_path)
     data = data_agent.data
 
-    agent = EvalAgent()
+    from agents.telemetry import Telemetry
+
+    # One event per question (latency by phase, tokens, retries, cost) in telemetry.jsonl;
+    # summarize it with agent.telemetry.print_summary() or python agents/telemetry.py
+    agent = EvalAgent(telemetry=Telemetry("telemetry.jsonl"))
     api_key = os.getenv("OPENAI_API_KEY")
 
     from models.cot_prompting import CoTPromptingModel
@@ -160,16 +877,36 @@ def main():
     from models.prompt_engineering import PromptEngineering
     from models.code_based_learning import CodeBasedModel
 
-    cot = CoTPromptingModel(api_key=api_key, data=data)
-    icl = ZeroShotModelICL2(api_key=api_key, data=data)
-    baseline = ZeroShotModel(api_key=api_key, data=data)
-    pe = PromptEngineering(api_key=api_key, data=data)
-    cbl = CodeBasedModel(api_key=api_key, data=data)
+    from agents.llm_client import LLMClient
+    from agents.response_cache import ResponseCache
+
+    from agents.rate_limiter import RateLimiter
+
+    # Answers are replayed from disk when a prompt was already sent, so re-running costs nothing.
+    # Set OPENAI_RPM / OPENAI_TPM to the account's limits to pace requests under them.
+    limiter = RateLimiter(requests_per_minute=int(os.getenv("OPENAI_RPM", 0)) or None,
+                          tokens_per_minute=int(os.getenv("OPENAI_TPM", 0)) or None)
+    llm = LLMClient(api_key=api_key, cache=ResponseCache(), limiter=limiter)
+
+    cot = CoTPromptingModel(api_key=api_key, data=data, llm=llm)
+    icl = ZeroShotModelICL2(api_key=api_key, data=data, llm=llm)
+    baseline = ZeroShotModel(api_key=api_key, data=data, llm=llm)
+    pe = PromptEngineering(api_key=api_key, data=data, llm=llm)
+    cbl = CodeBasedModel(api_key=api_key, data=data, llm=llm)
     
     #agent.evaluate(save_path="responses_cbl_4o-mini.txt", test_qa_path='competition/test_qa.csv',model=cbl)
     # agent.evaluate(save_path="responses_Cot_3.5-turbou.txt", test_qa_path='competition/test_qa.csv',model=cot)
     # agent.evaluate(save_path="responses_zero_shot_icl_4o-mini.txt", test_qa_path='competition/test_qa.csv',model=icl)
     agent.evaluate(save_path="response_testing.txt",model=cbl)
+    # In memory, without the Dataset / Runner round trip; scores against answers/*.txt:
+    # agent.evaluate_native(save_path="response_testing.txt", test_qa_path='competition/test_qa.csv', model=pe, concurrency=10)
+    # agent.evaluate_models({"responses_cbl_4o-mini.txt": cbl, "responses_Cot_3.5-turbo.txt": cot,
+    #                        "responses_zero_shot_icl_4o-mini.txt": icl, "responses_pe_4o-mini.txt": pe,
+    #                        "responses_zero_shot_baseline_3.5-turbo.txt": baseline},
+    #                       test_qa_path='competition/test_qa.csv', concurrency=20)
+    # Code generation split across processes, sharing the response cache and the rate limits of llm:
+    # agent.evaluate_sharded(CodeBasedModel, {"api_key": api_key}, test_qa_path='competition/test_qa.csv',
+    #                        save_path="responses_cbl_4o-mini.txt", data=data, llm=llm)
     #agent.evaluate(save_path="responses_pe_4o-mini.txt", test_qa_path='competition/test_qa.csv',model=pe)
     
     # Alternative batch processing approach:
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import importlib.util
+
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+MAX_CONNECTIONS = 64
+MAX_KEEPALIVE_CONNECTIONS = 32
+KEEPALIVE_EXPIRY = 120.0
+# HTTP/2 multiplexes concurrent requests over one connection; httpx needs the h2 package for it
+HTTP2 = importlib.util.find_spec('h2') is not None
+
+
+def pool_limits():
+    """Connection pool sizing shared by the sync and async pools."""
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY)
+
+
+class ClientPool:
+    """
+    Process-wide OpenAI clients sharing one keep-alive HTTP connection pool.
+
+    Every model used to create its own OpenAI client, each with its own connections
+    and TLS handshakes. Clients from this pool are created once per API key and all
+    send through the same httpx client, so connections are reused across models.
+
+    Async clients are tied to the event loop their connections were opened in, so
+    they are kept per loop and recreated when a new loop runs (e.g. a later asyncio.run()).
+    Coroutines that run a loop should await aclose_async() before the loop finishes,
+    otherwise its connections are left open.
+    """
+
+    def __init__(self):
+        """Initialize an empty pool; connections are opened on first use."""
+        self._http = None
+        self._clients = {}
+        self._async_loop = None
+        self._async_http = None
+        self._async_clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, api_key=None, base_url=None):
+        """
+        Args:
+            api_key (str, optional): OpenAI API key
+            base_url (str, optional): API base URL, e.g. a MockLLMServer (OPENAI_BASE_URL or the OpenAI API if None)
+
+        Returns:
+            OpenAI: The shared synchronous client for this key
+        """
+        with self._lock:
+            if self._http is None:
+                self._http = DefaultHttpxClient(limits=pool_limits(), http2=HTTP2)
+            if (api_key, base_url) not in self._clients:
+                # Retries are handled by the RateLimiter
+                self._clients[api_key, base_url] = OpenAI(api_key=api_key, base_url=base_url,
+                                                          http_client=self._http, max_retries=0)
+            return self._clients[api_key, base_url]
+
+    def async_client(self, api_key=None, base_url=None):
+        """
+        Must be called from a running event loop.
+
+        Args:
+            api_key (str, optional): OpenAI API key
+            base_url (str, optional): API base URL
+
+        Returns:
+            AsyncOpenAI: The shared asynchronous client for this key and loop
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._async_loop is not loop:
+                # The previous loop's connections can't be reused (or closed) from this one;
+                # aclose_async() should have closed them before that loop finished
+                self._async_loop = loop
+                self._async_http = DefaultAsyncHttpxClient(limits=pool_limits(), http2=HTTP2)
+                self._async_clients = {}
+            if (api_key, base_url) not in self._async_clients:
+                self._async_clients[api_key, base_url] = AsyncOpenAI(api_key=api_key, base_url=base_url,
+                                                                     http_client=self._async_http, max_retries=0)
+            return self._async_clients[api_key, base_url]
+
+    async def aclose_async(self):
+        """Close the asynchronous connections of the running event loop, if any were opened."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._async_loop is not loop:
+                return
+            http = self._async_http
+            self._async_loop = None
+            self._async_http = None
+            self._async_clients = {}
+        await http.aclose()
+
+    def close(self):
+        """Close the synchronous connections."""
+        with self._lock:
+            if self._http is not None:
+                self._http.close()
+            self._http = None
+            self._clients = {}
+
+
+# Shared by every model in the process
+default_client_pool = ClientPool()
@@ -0,0 +1,231 @@
+import re
+import json
+
+from agents.http_pool import default_client_pool
+from agents.batch_mode import DeferredRequest
+from agents.response_cache import request_key
+from agents.rate_limiter import default_rate_limiter
+from agents.telemetry import phase, record_usage, record_cache_hit
+
+ANSWER_KEY = re.compile(r'"answer"\s*:\s*')
+
+
+def parse_partial_answer(text):
+    """
+    Find the value of "answer" in a JSON response that may still be incomplete.
+
+    Args:
+        text (str): The response received so far
+
+    Returns:
+        tuple: (True, value) once the whole value has been received, (False, None) otherwise
+    """
+    match = ANSWER_KEY.search(text)
+    if match is None:
+        return False, None
+    try:
+        value, end = json.JSONDecoder().raw_decode(text, match.end())
+    except json.JSONDecodeError:
+        return False, None
+    # A number may still be missing digits until something follows it
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and end == len(text):
+        return False, None
+    return True, value
+
+
+class LLMClient:
+    """
+    The single place where the models send chat completion requests.
+
+    Models describe a call as a request dictionary (the keyword arguments of
+    client.chat.completions.create) and get back the stripped message content,
+    either synchronously with complete() or from asyncio code with acomplete().
+
+    With a ResponseCache, requests that were already answered are replayed from
+    disk without calling the API. With a BatchCollector in self.batch, requests that
+    are not cached are collected for the Batch API and raise DeferredRequest instead.
+
+    Requests sent to the API go through a RateLimiter, which paces them and retries
+    rate-limited or failed ones, so the OpenAI clients are created without retries of their own.
+    Those clients come from the process-wide ClientPool, so every LLMClient shares its connections.
+
+    complete_answer() and acomplete_answer() stream the response instead and stop
+    reading as soon as the value of "answer" is complete, skipping the columns_used
+    and explanation fields the models write after it.
+
+    Tokens, cache hits and network time are added to the telemetry event of the question
+    being answered, if any (see agents/telemetry.py).
+    """
+
+    def __init__(self, api_key=None, client=None, cache=None, limiter=None, async_client=None, base_url=None):
+        """
+        Args:
+            api_key (str, optional): OpenAI API key
+            client (OpenAI, optional): Synchronous client to use instead of creating one
+            cache (ResponseCache, optional): Persistent cache of responses
+            limiter (RateLimiter, optional): Rate limiter, the one shared by the whole process if None
+            async_client (AsyncOpenAI, optional): Asynchronous client to use instead of the pooled ones
+            base_url (str, optional): API base URL, e.g. a MockLLMServer's url
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        self.client = client or default_client_pool.client(api_key, base_url)
+        self.cache = cache
+        self.limiter = limiter or default_rate_limiter
+        self.batch = None
+        self._async_client = async_client
+
+    @property
+    def async_client(self):
+        """AsyncOpenAI client for the running event loop, shared through the ClientPool."""
+        if self._async_client is not None:
+            return self._async_client
+        return default_client_pool.async_client(self.api_key, self.base_url)
+
+    def complete(self, **request):
+        """
+        Send a chat completion request.
+
+        Args:
+            **request: Keyword arguments for client.chat.completions.create
+
+        Returns:
+            str: The content of the first choice, stripped
+        """
+        cached = self.cached(request)
+        if cached is not None:
+            return cached
+        self.defer(request)
+        with phase('network'):
+            response = self.limiter.call(lambda: self.client.chat.completions.create(**request), request)
+        record_usage(request, response)
+        return self.store(request, response.choices[0].message.content.strip())
+
+    async def acomplete(self, **request):
+        """
+        Send a chat completion request from asyncio code.
+
+        Args:
+            **request: Keyword arguments for client.chat.completions.create
+
+        Returns:
+            str: The content of the first choice, stripped
+        """
+        cached = self.cached(request)
+        if cached is not None:
+            return cached
+        self.defer(request)
+        client = self.async_client
+        with phase('network'):
+            response = await self.limiter.acall(lambda: client.chat.completions.create(**request), request)
+        record_usage(request, response)
+        return self.store(request, response.choices[0].message.content.strip())
+
+    def complete_answer(self, **request):
+        """
+        Stream a chat completion request and stop as soon as its "answer" value is complete.
+
+        Args:
+            **request: Keyword arguments for client.chat.completions.create
+
+        Returns:
+            str: {"answer": ...} as JSON, or the whole stripped content if it has no answer
+        """
+        cached = self.cached(request, answer_only=True)
+        if cached is not None:
+            return cached
+        self.defer(request)
+        text, complete, answer = '', False, None
+        with phase('network'):
+            stream = self.limiter.call(lambda: self.client.chat.completions.create(stream=True, **request), request)
+            try:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        text += chunk.choices[0].delta.content
+                        complete, answer = parse_partial_answer(text)
+                        if complete:
+                            break
+            finally:
+                # Closing the stream early cancels the rest of the completion
+                stream.close()
+        record_usage(request, content=text)
+        if complete:
+            return self.store(request, json.dumps({"answer": answer}), answer_only=True)
+        return self.store(request, text.strip())
+
+    async def acomplete_answer(self, **request):
+        """
+        Same as complete_answer() for asyncio code.
+        """
+        cached = self.cached(request, answer_only=True)
+        if cached is not None:
+            return cached
+        self.defer(request)
+        client = self.async_client
+        text, complete, answer = '', False, None
+        with phase('network'):
+            stream = await self.limiter.acall(lambda: client.chat.completions.create(stream=True, **request), request)
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        text += chunk.choices[0].delta.content
+                        complete, answer = parse_partial_answer(text)
+                        if complete:
+                            break
+            finally:
+                await stream.close()
+        record_usage(request, content=text)
+        if complete:
+            return self.store(request, json.dumps({"answer": answer}), answer_only=True)
+        return self.store(request, text.strip())
+
+    def answer_method(self, stream_answer=False, asynchronous=False):
+        """
+        The method sending a question's answer request, so that a model's sync and async
+        paths pick it the same way.
+
+        Args:
+            stream_answer (bool): Stream the response and stop once the answer is complete
+            asynchronous (bool): Return the coroutine method, for ask_question_async
+
+        Returns:
+            callable: complete, complete_answer, acomplete or acomplete_answer
+        """
+        if stream_answer:
+            return self.acomplete_answer if asynchronous else self.complete_answer
+        return self.acomplete if asynchronous else self.complete
+
+    def cached(self, request, answer_only=False):
+        """
+        Return the cached response to a request, or None.
+
+        With answer_only, a response cut short after its answer is accepted too.
+        """
+        if self.cache is None:
+            return None
+        cached = self.cache.get(request)
+        if cached is None and answer_only:
+            cached = self.cache.get_key(f"{request_key(request)}:answer")
+        if cached is not None:
+            record_cache_hit(request)
+        return cached
+
+    def defer(self, request):
+        """In batch mode, collect a request that has no cached response and raise DeferredRequest."""
+        if self.batch is not None:
+            self.batch.add(request)
+            raise DeferredRequest(request)
+
+    def store(self, request, content, answer_only=False):
+        """
+        Cache the response to a request and return it.
+
+        Responses cut short after their answer are stored apart, so that they are only
+        replayed for answer-only requests.
+        """
+        if self.cache is not None:
+            if answer_only:
+                self.cache.put_key(f"{request_key(request)}:answer", request.get('model'), content)
+            else:
+                self.cache.put(request, content)
+        return content
@@ -0,0 +1,379 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import random
+import hashlib
+import itertools
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.prompt_builder import count_tokens
+
+DEFAULT_PORT = 8089
+DEFAULT_ANSWER = "mock answer"
+STREAM_CHUNK_CHARS = 4
+# Rows of a dataset used to recognise it in a prompt (see RecordedResponder.signature)
+SIGNATURE_ROWS = 50
+# Header numbered_questions() puts before the questions of a batched call
+BATCH_HEADER = re.compile(r'Answer each of these (\d+) questions:')
+
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution.
+
+    Args:
+        spec (str): One of 'fixed:SECONDS', 'uniform:LOW,HIGH', 'normal:MEAN,STD' or
+            'lognormal:MEDIAN,SIGMA' (sigma of the underlying normal distribution)
+
+    Returns:
+        callable: Function taking a random.Random and returning a latency in seconds
+    """
+    kind, _, params = spec.partition(':')
+    try:
+        values = [float(value) for value in params.split(',')] if params else []
+    except ValueError:
+        raise ValueError(f"Invalid latency parameters: {spec}")
+    distributions = {
+        'fixed': (1, lambda rng, seconds: seconds),
+        'uniform': (2, lambda rng, low, high: rng.uniform(low, high)),
+        'normal': (2, lambda rng, mean, std: rng.gauss(mean, std)),
+        'lognormal': (2, lambda rng, median, sigma: median * rng.lognormvariate(0, sigma)),
+    }
+    if kind not in distributions or len(values) != distributions[kind][0]:
+        raise ValueError(f"Unknown latency distribution: {spec}")
+    sample = distributions[kind][1]
+    return lambda rng: max(0.0, sample(rng, *values))
+
+
+class RecordedResponder:
+    """
+    Answers chat completion requests deterministically from a recorded responses file.
+
+    The question is recognised in the prompt and answered with the line of the responses
+    file at the same index as the question in the test QA file, in the format the model
+    expects (JSON answer, JSON array of answers for batched questions, generated code for
+    CodeBasedModel, column list for the first CoT step). Unknown questions get a fixed answer.
+
+    Answers are recorded per (dataset, question). When the same question is asked about
+    several datasets, the dataset is the one whose column names and sample values appear
+    most in the prompt.
+    """
+
+    def __init__(self, responses_path=None, questions_path=None, competition_directory=None):
+        """
+        Args:
+            responses_path (str, optional): Responses file, one answer per line (e.g. model_responses/*.txt)
+            questions_path (str, optional): Test QA CSV with 'question' and 'dataset' columns, in the same order
+            competition_directory (str, optional): Folder of the datasets, whose content tells apart
+                questions asked about several datasets (the folder of questions_path if None)
+        """
+        answers = []
+        if responses_path:
+            with open(responses_path, 'r', encoding='utf-8') as f:
+                answers = [line.rstrip('\n') for line in f]
+        rows = []
+        if questions_path:
+            with open(questions_path, 'r', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+            competition_directory = competition_directory or os.path.dirname(os.path.abspath(questions_path))
+        self.competition_directory = competition_directory
+        # question -> {dataset: answer}, datasets in the order they are first asked about
+        self.answers = {}
+        for row, answer in zip(rows, answers):
+            self.answers.setdefault(row['question'], {}).setdefault(row.get('dataset'), answer)
+        self._signatures = {}
+        # Longest first, so a question containing another one is matched as a whole
+        self.questions = sorted(self.answers, key=len, reverse=True)
+
+    def signature(self, dataset, max_rows=SIGNATURE_ROWS):
+        """
+        Column names and distinct values of the first rows of a dataset's sample (or full)
+        CSV, or an empty set if it can't be read.
+        """
+        if dataset not in self._signatures:
+            values = set()
+            for split in ('sample', 'all'):
+                path = os.path.join(self.competition_directory or '', str(dataset), f'{split}.csv')
+                if os.path.exists(path):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        for row in itertools.islice(csv.reader(f), max_rows + 1):
+                            values.update(value for value in row if value)
+                    break
+            self._signatures[dataset] = values
+        return self._signatures[dataset]
+
+    def answer(self, text, context=None):
+        """
+        Recorded answer for the question found in a text, or a fixed answer.
+
+        Args:
+            text (str): Text containing the question
+            context (str, optional): The whole prompt, searched for each dataset's signature
+                when the question was asked about several datasets (text if None)
+        """
+        for question in self.questions:
+            if question in text:
+                by_dataset = self.answers[question]
+                if len(by_dataset) == 1:
+                    return next(iter(by_dataset.values()))
+                context = text if context is None else context
+                # max keeps the first dataset on ties
+                dataset = max(by_dataset, key=lambda name: sum(value in context for value in self.signature(name)))
+                return by_dataset[dataset]
+        return DEFAULT_ANSWER
+
+    def __call__(self, request):
+        """
+        Args:
+            request (dict): Body of a chat completion request
+
+        Returns:
+            str: The response content
+        """
+        messages = request.get('messages') or [{}]
+        everything = "\n".join(message.get('content') or '' for message in messages)
+        last = messages[-1].get('content') or ''
+        if 'identifying important columns' in everything:
+            return json.dumps({"columns_used": []})
+        batch = BATCH_HEADER.search(last)
+        if batch:
+            # Only the questions numbered_questions() lists after its header, not numbered instructions
+            numbered = re.findall(r'^\s*\d+\. (.+)$', last[batch.end():], re.M)[:int(batch.group(1))]
+            return json.dumps([{"answer": self.answer(question, everything)} for question in numbered])
+        answer = self.answer(last, everything)
+        if 'generates Python code' in everything:
+            return f"def answer(df):\n    return {{\"answer\": {json.dumps(answer)}}}"
+        return json.dumps({"answer": answer, "columns_used": [], "explanation": "Recorded response."})
+
+
+class MockLLMServer:
+    """
+    Local HTTP server speaking the chat completions API, for benchmarking without network access.
+
+    Point a model at it with base_url=server.url (or LLMClient(base_url=...)). Each request
+    waits for a latency drawn from the configured distribution, and a fraction of them fail
+    with error_status to exercise retries. Draws are seeded so that runs are reproducible.
+
+    Responses are generated at one chunk of a few characters per token_interval after the
+    initial latency; streaming requests (stream=True) receive the chunks as server-sent events.
+    """
+
+    def __init__(self, responder=None, latency='fixed:0', error_rate=0.0, error_status=429, seed=0,
+                 host='127.0.0.1', port=0, token_interval=0.0):
+        """
+        Args:
+            responder (callable, optional): Function from request body to response content
+                (a RecordedResponder without recordings if None)
+            latency (str): Latency distribution (see parse_latency)
+            error_rate (float): Fraction of requests answered with error_status
+            error_status (int): HTTP status of the simulated errors
+            seed (int): Seed for latencies and errors
+            host (str): Interface to listen on
+            port (int): Port to listen on, any free port if 0
+            token_interval (float): Seconds between streamed chunks
+        """
+        self.responder = responder or RecordedResponder()
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.token_interval = token_interval
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL to give to the OpenAI client."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def draw(self):
+        """Draw the latency and failure of the next request."""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency(self.rng)
+            failed = self.rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return delay, failed
+
+    def completion(self, request):
+        """Build the chat completion response body for a request."""
+        content = self.responder(request)
+        prompt_tokens = sum(count_tokens(message.get('content') or '') for message in request.get('messages', []))
+        completion_tokens = count_tokens(content)
+        return {
+            'id': 'chatcmpl-mock-' + hashlib.sha1(content.encode('utf-8')).hexdigest()[:12],
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        }
+
+    def handler_class(self):
+        """Request handler bound to this server."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    return self.send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+                delay, failed = server.draw()
+                time.sleep(delay)
+                if failed:
+                    return self.send_json(server.error_status, {'error': {'message': 'Simulated error',
+                                                                          'type': 'mock_error'}})
+                try:
+                    request = json.loads(body)
+                except ValueError:
+                    return self.send_json(400, {'error': {'message': 'Invalid JSON body'}})
+                completion = server.completion(request)
+                if request.get('stream'):
+                    return self.send_stream(completion)
+                # Same generation time as when streaming
+                content = completion['choices'][0]['message']['content']
+                time.sleep(server.token_interval * -(-len(content) // STREAM_CHUNK_CHARS))
+                self.send_json(200, completion)
+
+            def send_stream(self, completion):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+                content = completion['choices'][0]['message']['content']
+                pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+                try:
+                    for piece in pieces + [None]:
+                        delta = {'content': piece} if piece is not None else {}
+                        chunk = {
+                            'id': completion['id'], 'object': 'chat.completion.chunk',
+                            'created': completion['created'], 'model': completion['model'],
+                            'choices': [{'index': 0, 'delta': delta,
+                                         'finish_reason': None if piece is not None else 'stop'}],
+                        }
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                        self.wfile.flush()
+                        time.sleep(server.token_interval)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading, e.g. once it had the answer
+                    pass
+
+            def send_json(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                if status == 429:
+                    self.send_header('Retry-After', '0')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """Serve in a background thread and return the base URL."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        """Stop serving."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def check_models(url, competition_directory, dataset=None, question="How many rows are there?"):
+    """
+    Ask one question through every model class against a running mock server and check
+    that each gets back a single {"answer": ...} object, as ask_question promises.
+
+    Args:
+        url (str): Base URL of the mock server
+        competition_directory (str): Competition data to load
+        dataset (str, optional): Dataset to ask about (the first one if None)
+        question (str): Question to ask
+
+    Returns:
+        list: Names of the model classes whose response was not a single answer
+    """
+    from agents.dataAgent import DataAgent
+    import models
+
+    agent = DataAgent()
+    agent.load_data(competition_directory)
+    dataset = dataset or next(iter(agent.data))
+    failed = []
+    for name in models.__all__:
+        model = getattr(models, name)(api_key="mock", data=agent.data, base_url=url)
+        response = model.ask_question(dataset, question)
+        try:
+            parsed = json.loads(response)
+        except json.JSONDecodeError:
+            parsed = None
+        ok = isinstance(parsed, dict) and "answer" in parsed
+        print(f"{name:<20} {'ok' if ok else 'FAILED'}  {response[:80]!r}")
+        if not ok:
+            failed.append(name)
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a mock chat completions API")
+    parser.add_argument('--responses', help="Recorded responses file, e.g. model_responses/responses_pe_4o-mini.txt")
+    parser.add_argument('--questions', help="Test QA CSV the responses were recorded for")
+    parser.add_argument('--latency', default='fixed:0',
+                        help="fixed:S, uniform:LOW,HIGH, normal:MEAN,STD or lognormal:MEDIAN,SIGMA (seconds)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=429, help="HTTP status of failed requests")
+    parser.add_argument('--token-interval', type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--check', metavar='COMPETITION_DIR',
+                        help="Check that every model class gets a single answer back, then exit")
+    args = parser.parse_args()
+
+    server = MockLLMServer(RecordedResponder(args.responses, args.questions), latency=args.latency,
+                           error_rate=args.error_rate, error_status=args.error_status, seed=args.seed,
+                           host=args.host, port=args.port, token_interval=args.token_interval)
+    if args.check:
+        server.start()
+        failed = check_models(server.url, args.check)
+        server.stop()
+        sys.exit(1 if failed else 0)
+    print(f"Serving mock chat completions at {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Served {server.requests} requests ({server.errors} simulated errors)")
+        server.httpd.server_close()
@@ -0,0 +1,333 @@
+import re
+import math
+
+from agents.render_cache import default_render_cache
+from agents.column_profile import profile_rows, render_schema
+from agents.telemetry import record_trim
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a character-based estimate
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4
+DEFAULT_MAX_CELL_CHARS = 100
+DEFAULT_ENCODING = 'o200k_base'
+
+
+def count_tokens(text, encoding_name=DEFAULT_ENCODING):
+    """
+    Count the tokens of a text offline.
+
+    Uses tiktoken when it is installed, otherwise estimates one token per four characters.
+
+    Args:
+        text (str): The text to count
+        encoding_name (str): tiktoken encoding to use
+
+    Returns:
+        int: Number of tokens
+    """
+    if tiktoken is not None:
+        return len(tiktoken.get_encoding(encoding_name).encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def question_columns(column_names, question):
+    """
+    Guess which columns a question refers to from the words they share.
+
+    Args:
+        column_names (list): Column names of the dataset
+        question (str): The question to answer
+
+    Returns:
+        list: Column names mentioned in the question, in header order
+    """
+    question_words = set(re.findall(r'[a-z0-9]+', question.lower()))
+    relevant = []
+    for name in column_names:
+        name_words = set(re.findall(r'[a-z0-9]+', name.lower()))
+        if name.lower() in question.lower() or (name_words and name_words <= question_words):
+            relevant.append(name)
+    return relevant
+
+
+def select_columns(rows, columns):
+    """
+    Keep only some columns of a table.
+
+    Args:
+        rows (list): CSV rows, header first
+        columns (list): Names of the columns to keep
+
+    Returns:
+        list: The projected rows, header first, columns in header order
+    """
+    rows = iter(rows)
+    header = next(rows, [])
+    indices = [i for i, name in enumerate(header) if name in columns]
+    return [[header[i] for i in indices]] + [[row[i] if i < len(row) else '' for i in indices] for row in rows]
+
+
+def schema_text(data, dataset_name, dataset_type='sample', num_rows=3):
+    """
+    Describe a dataset compactly: one line per column with its type and value summary,
+    followed by a few sample rows.
+
+    Uses the profile stored by DataAgent(profiles=True) when available, and stores
+    the profile in the dataset entry otherwise.
+
+    Args:
+        data (dict): Datasets as stored in DataAgent.data
+        dataset_name (str): The competition dataset folder name
+        dataset_type (str): Either 'sample' or 'all'
+        num_rows (int): Number of sample rows to include
+
+    Returns:
+        str: The schema text
+    """
+    if dataset_name not in data or dataset_type not in data[dataset_name]:
+        raise FileNotFoundError(f"Dataset {dataset_name}/{dataset_type}.csv not found.")
+    entry = data[dataset_name]
+    rows = entry[dataset_type]
+    if f'{dataset_type}_profile' not in entry:
+        entry[f'{dataset_type}_profile'] = profile_rows(rows)
+    profile = entry[f'{dataset_type}_profile']
+    sample_rows = default_render_cache.render_rows(rows[:num_rows + 1], 'csv')
+    return f"{render_schema(profile)}\n\nSample rows:\n{sample_rows}"
+
+
+PROMPT_LAYOUTS = ('inline', 'prefix')
+
+
+def check_prompt_layout(prompt_layout):
+    """Raise a ValueError for an unknown prompt layout."""
+    if prompt_layout not in PROMPT_LAYOUTS:
+        raise ValueError(f"Unknown prompt layout {prompt_layout!r}, expected one of {', '.join(PROMPT_LAYOUTS)}")
+
+
+def prefix_messages(system, instructions, question):
+    """
+    Build chat messages in the 'prefix' layout.
+
+    Everything that does not depend on the question (system message, instructions and
+    the table) goes first, in one system message, and the question comes last on its
+    own. Every question about a dataset then shares a byte-identical prefix, which lets
+    the API's prompt caching reuse it.
+
+    Args:
+        system (str): The model's system message
+        instructions (str): Fixed instructions, including the table
+        question (str): The question to answer
+
+    Returns:
+        list: Chat messages
+    """
+    return [
+        {"role": "system", "content": f"{system}\n{instructions}"},
+        {"role": "user", "content": question},
+    ]
+
+
+def layout_messages(system, prompt, question, prompt_layout="inline"):
+    """
+    Build chat messages from a model's prompt in the given layout.
+
+    Models write one prompt for both layouts: with "inline" it asks the question itself,
+    with "prefix" it refers to the question in the next message (see prefix_messages).
+
+    Args:
+        system (str): The model's system message
+        prompt (str): Instructions and table, asking the question as the layout requires
+        question (str): The question, sent on its own in the "prefix" layout
+        prompt_layout (str): "inline" or "prefix"
+
+    Returns:
+        list: Chat messages
+    """
+    if prompt_layout == "prefix":
+        return prefix_messages(system, prompt, question)
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+
+
+class PromptBuilder:
+    """
+    Fits the dataset text embedded in a prompt into a token budget.
+
+    When the rendered table is over budget it is reduced step by step, stopping as
+    soon as it fits:
+        1. columns the question does not refer to are dropped,
+        2. cells longer than max_cell_chars are truncated,
+        3. rows are subsampled evenly across the table.
+    What was trimmed is recorded on the telemetry event of the question, if any.
+
+    In the 'prefix' layout the table must be the same for every question on a
+    dataset, so the question is not used to choose columns.
+    """
+
+    def __init__(self, token_budget=None, max_cell_chars=DEFAULT_MAX_CELL_CHARS, encoding_name=DEFAULT_ENCODING,
+                 prompt_layout='inline'):
+        """
+        Args:
+            token_budget (int, optional): Maximum number of tokens for the table. No limit if None.
+            prompt_layout (str): Either 'inline' or 'prefix' (see prefix_messages)
+            max_cell_chars (int): Length above which cells are truncated when over budget
+            encoding_name (str): tiktoken encoding used to count tokens
+        """
+        self.token_budget = token_budget
+        self.max_cell_chars = max_cell_chars
+        self.encoding_name = encoding_name
+        self.prompt_layout = prompt_layout
+        # (dataset, split, format) -> (table identity, tokens) of the full rendered tables
+        self._table_tokens = {}
+
+    def count(self, text):
+        """Count the tokens of a text with this builder's encoding."""
+        return count_tokens(text, self.encoding_name)
+
+    def table_tokens(self, data, dataset_name, dataset_type, fmt, text):
+        """
+        Count the tokens of a full rendered table, once per table.
+
+        Args:
+            data (dict): Datasets as stored in DataAgent.data
+            dataset_name (str): The competition dataset folder name
+            dataset_type (str): Either 'sample' or 'all'
+            fmt (str): Either 'plain' or 'csv'
+            text (str): The table rendered by the RenderCache
+
+        Returns:
+            int: Number of tokens
+        """
+        rows = data[dataset_name][dataset_type]
+        key = (dataset_name, dataset_type, fmt)
+        # Same check as the RenderCache: the name may refer to another table
+        identity = (id(rows), len(rows))
+        cached = self._table_tokens.get(key)
+        if cached is not None and cached[0] == identity:
+            return cached[1]
+        tokens = self.count(text)
+        self._table_tokens[key] = (identity, tokens)
+        return tokens
+
+    def table(self, data, dataset_name, dataset_type='sample', question='', relevant_columns=None, fmt='plain',
+              columns=None):
+        """
+        Get the CSV text of a dataset split, trimmed to the token budget.
+
+        Args:
+            data (dict): Datasets as stored in DataAgent.data
+            dataset_name (str): The competition dataset folder name
+            dataset_type (str): Either 'sample' or 'all'
+            question (str): The question, used to pick the columns to keep
+            relevant_columns (list, optional): Columns to keep, instead of guessing them from the question
+            fmt (str): Either 'plain' or 'csv' (see RenderCache)
+            columns (list, optional): Only include these columns, whatever the budget
+
+        Returns:
+            str: CSV content as a string
+        """
+        if columns:
+            if dataset_name not in data or dataset_type not in data[dataset_name]:
+                raise FileNotFoundError(f"Dataset {dataset_name}/{dataset_type}.csv not found.")
+            rows = select_columns(data[dataset_name][dataset_type], columns)
+            text = default_render_cache.render_rows(rows, fmt)
+            if self.token_budget is None:
+                return text
+            tokens = self.count(text)
+        else:
+            text = default_render_cache.render(data, dataset_name, dataset_type, fmt)
+            if self.token_budget is None:
+                return text
+            tokens = self.table_tokens(data, dataset_name, dataset_type, fmt, text)
+            rows = data[dataset_name][dataset_type]
+        if tokens <= self.token_budget:
+            return text
+        report = {
+            'dataset': dataset_name,
+            'budget': self.token_budget,
+            'original_tokens': tokens,
+            'tokens': tokens,
+            'dropped_columns': [],
+            'truncated_cells': 0,
+            'rows_total': len(rows) - 1,
+            'rows_kept': len(rows) - 1,
+        }
+        if self.prompt_layout == 'prefix':
+            question, relevant_columns = '', None
+        text = self.fit(rows, question, relevant_columns, fmt, report)
+        record_trim(report)
+        return text
+
+    def fit(self, rows, question='', relevant_columns=None, fmt='plain', report=None):
+        """
+        Trim rows until their rendered text fits the token budget.
+
+        Args:
+            rows (list): CSV rows, header first
+            question (str): The question, used to pick the columns to keep
+            relevant_columns (list, optional): Columns to keep, instead of guessing them from the question
+            fmt (str): Either 'plain' or 'csv'
+            report (dict, optional): Trim report to fill in (see table)
+
+        Returns:
+            str: CSV content as a string
+        """
+        render = default_render_cache.render_rows
+        rows = list(rows)
+        header, body = rows[0], rows[1:]
+        if report is None:
+            report = {}
+
+        # 1. Drop the columns the question does not need
+        keep = [name for name in header if name in (relevant_columns or question_columns(header, question))]
+        if keep and len(keep) < len(header):
+            indices = [i for i, name in enumerate(header) if name in keep]
+            report['dropped_columns'] = [name for name in header if name not in keep]
+            header = [header[i] for i in indices]
+            body = [[row[i] if i < len(row) else '' for i in indices] for row in body]
+            text = render([header] + body, fmt)
+            if self.finish(text, report):
+                return text
+
+        # 2. Truncate long cells
+        limit = self.max_cell_chars
+        truncated = 0
+        shortened = []
+        for row in body:
+            new_row = []
+            for cell in row:
+                if len(cell) > limit:
+                    cell = cell[:limit - 3] + '...'
+                    truncated += 1
+                new_row.append(cell)
+            shortened.append(new_row)
+        body = shortened
+        report['truncated_cells'] = truncated
+        text = render([header] + body, fmt)
+        if self.finish(text, report):
+            return text
+
+        # 3. Keep evenly spaced rows, estimating how many fit from the average row size
+        header_tokens = self.count(render([header], fmt))
+        row_tokens = max(1, (self.count(text) - header_tokens) / max(1, len(body)))
+        keep_rows = min(len(body), max(0, int((self.token_budget - header_tokens) / row_tokens)))
+        while True:
+            step = len(body) / keep_rows if keep_rows else 0
+            kept = [body[int(i * step)] for i in range(keep_rows)]
+            text = render([header] + kept, fmt)
+            report['rows_kept'] = keep_rows
+            if self.finish(text, report) or keep_rows == 0:
+                report['tokens'] = self.count(text)
+                return text
+            keep_rows = int(keep_rows * 0.9)
+
+    def finish(self, text, report):
+        """Record the token count of a candidate text in the report and tell whether it fits the budget."""
+        tokens = self.count(text)
+        report['tokens'] = tokens
+        return tokens <= self.token_budget
@@ -0,0 +1,165 @@
+import json
+
+import openai
+
+from agents.prompt_builder import prefix_messages
+
+MAX_QUESTIONS_PER_CALL = 40
+ANSWER_TOKENS = 60
+EXTRA_TOKENS = 50
+
+
+def numbered_questions(questions):
+    """
+    Turn several questions into one prompt question asking for a JSON array of answers.
+
+    Args:
+        questions (list): Questions about the same dataset
+
+    Returns:
+        str: The numbered questions followed by the expected response format
+    """
+    lines = [f"Answer each of these {len(questions)} questions:"]
+    lines += [f"{number}. {question}" for number, question in enumerate(questions, 1)]
+    lines.append(
+        f"Respond with only a JSON array of {len(questions)} objects, one per question in the same order, "
+        'each like {"answer": "<your answer>"}, without explanations.'
+    )
+    return "\n".join(lines)
+
+
+def batch_messages(csv_data, questions, prompt_layout="inline"):
+    """
+    Build the chat messages asking several questions about a table at once.
+
+    The models' single-question templates show a single {"answer": ...} object as the
+    example response, which contradicts the array asked for here, so batched calls use
+    this template instead, with an array as the example.
+
+    Args:
+        csv_data (str): The table as CSV text
+        questions (list): Questions about the table
+        prompt_layout (str): "inline" or "prefix" (see prefix_messages)
+
+    Returns:
+        list: Chat messages
+    """
+    system = "You are a data analyst answering questions about tabular data."
+    instructions = f"""
+        You are an AI answering several questions based on tabular data.
+
+        Here is the dataset:
+        ```
+        {csv_data}
+        ```
+
+        Answer every question directly, without explanation, in the order they are asked.
+
+        Example response to two questions:
+        [
+            {{"answer": "<answer to question 1>"}},
+            {{"answer": "<answer to question 2>"}}
+        ]
+        """
+    if prompt_layout == "prefix":
+        return prefix_messages(system, instructions, numbered_questions(questions))
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": f"{instructions}\n{numbered_questions(questions)}"}
+    ]
+
+
+def batch_request(model_name, csv_data, questions, prompt_layout="inline"):
+    """
+    Build the chat completion request (keyword arguments for the OpenAI client) for several questions.
+
+    Args:
+        model_name (str): OpenAI model to ask
+        csv_data (str): The table as CSV text
+        questions (list): Questions about the table
+        prompt_layout (str): "inline" or "prefix"
+
+    Returns:
+        dict: The request
+    """
+    return dict(
+        model=model_name,
+        messages=batch_messages(csv_data, questions, prompt_layout),
+        max_tokens=batch_max_tokens(len(questions)),
+        temperature=0
+    )
+
+
+def batch_max_tokens(num_questions):
+    """Response token limit for a batch of questions."""
+    return ANSWER_TOKENS * num_questions + EXTRA_TOKENS
+
+
+def parse_batch_answers(content, num_questions):
+    """
+    Split the response to numbered_questions() into one response per question.
+
+    Args:
+        content (str): The model's response
+        num_questions (int): Number of questions asked
+
+    Returns:
+        list: One JSON string {"answer": ...} per question, or None if the response
+            is not a JSON array with one answer per question
+    """
+    start, end = content.find('['), content.rfind(']')
+    if start == -1 or end < start:
+        return None
+    try:
+        items = json.loads(content[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(items, list) or len(items) != num_questions:
+        return None
+    answers = []
+    for item in items:
+        if isinstance(item, dict):
+            if "answer" not in item:
+                return None
+        else:
+            item = {"answer": item}
+        answers.append(json.dumps(item))
+    return answers
+
+
+def ask_questions_batched(model, dataset_name, questions, dataset_type="sample",
+                          max_questions=MAX_QUESTIONS_PER_CALL):
+    """
+    Answer several questions about a dataset, sending the table once per group of questions.
+
+    Used by the prompt-based models' ask_questions. A group whose request fails (e.g. a
+    prompt over the context length, or retries running out) or whose response can't be
+    split into one answer per question is asked again one question at a time.
+
+    Args:
+        model: Model with prompt_builder, build_batch_request, llm and ask_question
+        dataset_name (str): The competition dataset folder name
+        questions (list): Questions about the dataset
+        dataset_type (str): Either 'sample' or 'all'
+        max_questions (int): Maximum number of questions per call
+
+    Returns:
+        list: The model's response to each question, as ask_question returns it
+    """
+    responses = []
+    for i in range(0, len(questions), max_questions):
+        group = questions[i:i + max_questions]
+        # Keep the columns any of the questions refers to when the table is over budget
+        csv_data = model.prompt_builder.table(model.agent.data, dataset_name, dataset_type, " ".join(group))
+        request = model.build_batch_request(csv_data, group)
+        try:
+            answers = parse_batch_answers(model.llm.complete(**request), len(group))
+            if answers is None:
+                print(f"Malformed batched answers for {dataset_name}, asking {len(group)} questions one by one")
+        except openai.APIError as e:
+            answers = None
+            print(f"Batched request failed for {dataset_name} ({e}), asking {len(group)} questions one by one")
+        if answers is None:
+            answers = [model.ask_question(dataset_name, question, dataset_type) for question in group]
+        responses.extend(answers)
+    return responses
@@ -0,0 +1,249 @@
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+
+import openai
+
+from agents.prompt_builder import count_tokens
+from agents.telemetry import record_retry
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                    openai.InternalServerError)
+METRICS_WINDOW = 60.0
+
+
+class TokenBucket:
+    """
+    Allows `rate` units per minute, refilled continuously, with bursts of up to one minute's worth.
+    """
+
+    def __init__(self, rate):
+        """
+        Args:
+            rate (float): Units allowed per minute
+        """
+        self.rate = rate
+        self.available = rate
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        """Add the units earned since the last refill."""
+        self.available = min(self.rate, self.available + (now - self.updated) * self.rate / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` units are available (amounts above the rate count as the full rate)."""
+        missing = min(amount, self.rate) - self.available
+        return max(0.0, missing * 60.0 / self.rate)
+
+    def consume(self, amount):
+        """Take `amount` units, possibly going into debt for oversized requests."""
+        self.available -= amount
+
+
+class RateLimiter:
+    """
+    Paces chat completion requests to stay under requests-per-minute and tokens-per-minute
+    limits, and retries rate-limited or failed requests with jittered exponential backoff.
+
+    Tokens are estimated before sending (prompt tokens plus max_tokens, as the API counts
+    them against the limit). A 429 pauses every request going through the limiter, not
+    only the one that got it. Shared by all models, so concurrent evaluations are paced together.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_retries=6, base_delay=1.0,
+                 max_delay=60.0):
+        """
+        Args:
+            requests_per_minute (int, optional): Request limit. No limit if None.
+            tokens_per_minute (int, optional): Token limit. No limit if None.
+            max_retries (int): Retries of a failed request before giving up
+            base_delay (float): Backoff before the first retry, in seconds, doubled on every retry
+            max_delay (float): Maximum backoff, in seconds
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.set_limits(requests_per_minute, tokens_per_minute)
+        self.paused_until = 0.0
+        self.sent = deque()
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def set_limits(self, requests_per_minute=None, tokens_per_minute=None):
+        """
+        Change the limits, e.g. to the account's limits.
+
+        Args:
+            requests_per_minute (int, optional): Request limit. No limit if None.
+            tokens_per_minute (int, optional): Token limit. No limit if None.
+        """
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def estimate_tokens(self, request):
+        """
+        Estimate the tokens a request counts against the limit.
+
+        Args:
+            request (dict): Keyword arguments for client.chat.completions.create
+
+        Returns:
+            int: Prompt tokens plus max_tokens
+        """
+        prompt = sum(count_tokens(message.get('content') or '') for message in request.get('messages', []))
+        return prompt + (request.get('max_tokens') or 0)
+
+    def reserve(self, tokens):
+        """
+        Take a slot for a request if the limits allow it now.
+
+        Args:
+            tokens (int): Estimated tokens of the request
+
+        Returns:
+            float: 0 if the request may be sent, otherwise the seconds to wait before trying again
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = self.paused_until - now
+            for bucket, amount in ((self.request_bucket, 1), (self.token_bucket, tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(amount))
+            if wait > 0:
+                return wait
+            for bucket, amount in ((self.request_bucket, 1), (self.token_bucket, tokens)):
+                if bucket is not None:
+                    bucket.consume(amount)
+            self.requests += 1
+            self.sent.append((now, tokens))
+            self._prune(now)
+            return 0.0
+
+    def _prune(self, now):
+        """Drop the sent requests older than the metrics window. Called with the lock held."""
+        while self.sent and now - self.sent[0][0] > METRICS_WINDOW:
+            self.sent.popleft()
+
+    def backoff(self, attempt, error):
+        """
+        Record a failed attempt and compute how long to wait before the next one.
+
+        Uses the Retry-After header when the API sends one, otherwise exponential backoff
+        with full jitter. After a 429 every request waits, not only this one.
+
+        Args:
+            attempt (int): Number of the failed attempt, from 0
+            error (Exception): The error raised by the API client
+
+        Returns:
+            float: Seconds to wait
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            delay = max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+        with self._lock:
+            self.retries += 1
+            if isinstance(error, openai.RateLimitError):
+                self.rate_limited += 1
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        return delay
+
+    def call(self, send, request):
+        """
+        Send a request once the limits allow it, retrying retryable errors.
+
+        Args:
+            send (callable): Function sending the request and returning the response
+            request (dict): Keyword arguments for client.chat.completions.create
+
+        Returns:
+            The response returned by send
+        """
+        tokens = self.estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            while True:
+                wait = self.reserve(tokens)
+                if not wait:
+                    break
+                self.record_wait(wait)
+                time.sleep(wait)
+            try:
+                return send()
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                delay = self.backoff(attempt, e)
+                record_retry()
+                print(f"{type(e).__name__}, retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+    async def acall(self, send, request):
+        """
+        Same as call() for asyncio code; send returns an awaitable.
+        """
+        tokens = self.estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            while True:
+                wait = self.reserve(tokens)
+                if not wait:
+                    break
+                self.record_wait(wait)
+                await asyncio.sleep(wait)
+            try:
+                return await send()
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                delay = self.backoff(attempt, e)
+                record_retry()
+                print(f"{type(e).__name__}, retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+
+    def record_wait(self, seconds):
+        """Add to the total time spent waiting for the limits."""
+        with self._lock:
+            self.waited += seconds
+
+    def metrics(self):
+        """
+        Current throughput and retry counts.
+
+        Returns:
+            dict: Requests and estimated tokens sent in the last minute, totals of requests,
+                retries, 429s and failures, and seconds spent waiting for the limits
+        """
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                'requests_per_minute': len(self.sent),
+                'tokens_per_minute': sum(tokens for _, tokens in self.sent),
+                'requests': self.requests,
+                'retries': self.retries,
+                'rate_limited': self.rate_limited,
+                'failures': self.failures,
+                'waited_seconds': round(self.waited, 2),
+            }
+
+    def print_metrics(self):
+        """Print the current metrics."""
+        print(", ".join(f"{name}: {value}" for name, value in self.metrics().items()))
+
+
+# Shared by every model in the process
+default_rate_limiter = RateLimiter()
@@ -0,0 +1,124 @@
+import csv
+import threading
+from io import StringIO
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 256
+
+
+class RenderCache:
+    """
+    Caches the CSV text the models embed in their prompts.
+
+    Every model turns the same dataset into the same string for each of the ~35
+    questions asked about it. The rendered text is kept per
+    (dataset, split, format) and shared by all models in the process, with the
+    least recently used entries dropped once the size or entry limit is reached.
+
+    Formats:
+        'plain': rows joined with ',' and '\\n', as the prompt-based models send them
+        'csv': written with csv.writer (quoted values), as CodeBasedModel sends them
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            max_bytes (int): Maximum total length of the cached strings
+            max_entries (int): Maximum number of cached strings
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def render_rows(self, rows, fmt='plain'):
+        """
+        Serialize rows without caching.
+
+        Args:
+            rows (list): CSV rows, header first
+            fmt (str): Either 'plain' or 'csv'
+
+        Returns:
+            str: The rows as CSV text
+        """
+        if fmt == 'plain':
+            return "\n".join([",".join(row) for row in rows])
+        if fmt == 'csv':
+            output = StringIO()
+            writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
+            writer.writerows(rows)
+            return output.getvalue().strip()
+        raise ValueError(f"Unknown render format: {fmt}")
+
+    def render(self, data, dataset_name, dataset_type='sample', fmt='plain'):
+        """
+        Get the CSV text of a dataset split, rendering it only on the first request.
+
+        Args:
+            data (dict): Datasets as stored in DataAgent.data
+            dataset_name (str): The competition dataset folder name
+            dataset_type (str): Either 'sample' or 'all'
+            fmt (str): Either 'plain' or 'csv'
+
+        Returns:
+            str: CSV content as a string
+        """
+        if dataset_name not in data or dataset_type not in data[dataset_name]:
+            raise FileNotFoundError(f"Dataset {dataset_name}/{dataset_type}.csv not found.")
+        rows = data[dataset_name][dataset_type]
+        key = (dataset_name, dataset_type, fmt)
+        # The same name may refer to a different table (another DataAgent, or a reloaded split)
+        identity = (id(rows), len(rows))
+
+        with self._lock:
+            cached = self.entries.get(key)
+            if cached is not None and cached[0] == identity:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        text = self.render_rows(rows, fmt)
+
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= len(previous[1])
+            if len(text) <= self.max_bytes:
+                self.entries[key] = (identity, text)
+                self.total_bytes += len(text)
+                while self.total_bytes > self.max_bytes or len(self.entries) > self.max_entries:
+                    _, (_, evicted) = self.entries.popitem(last=False)
+                    self.total_bytes -= len(evicted)
+        return text
+
+    def clear(self):
+        """Drop every cached string."""
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+
+# Shared by every model in the process
+default_render_cache = RenderCache()
+
+
+def render_csv(data, dataset_name, dataset_type='sample', fmt='plain'):
+    """
+    Get the CSV text of a dataset split through the process-wide RenderCache.
+
+    Args:
+        data (dict): Datasets as stored in DataAgent.data
+        dataset_name (str): The competition dataset folder name
+        dataset_type (str): Either 'sample' or 'all'
+        fmt (str): Either 'plain' or 'csv'
+
+    Returns:
+        str: CSV content as a string
+    """
+    return default_render_cache.render(data, dataset_name, dataset_type, fmt)
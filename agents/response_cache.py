@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.llm_cache.sqlite')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+KEY_FIELDS = ('model', 'messages', 'max_tokens', 'temperature')
+# Access times of cache hits are written in batches of this many
+TOUCH_BATCH = 256
+
+
+def request_key(request):
+    """
+    Hash the parts of a chat completion request that determine its response.
+
+    Args:
+        request (dict): Keyword arguments for client.chat.completions.create
+
+    Returns:
+        str: sha256 hex digest of the model name, messages, max_tokens and temperature
+    """
+    fields = {name: request.get(name) for name in KEY_FIELDS}
+    encoded = json.dumps(fields, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Stores model responses on disk in SQLite, keyed by a hash of the request.
+
+    With temperature=0 the same prompt gives the same answer, so re-running an
+    evaluation after changing how responses are parsed or scored replays every
+    answer from disk instead of calling the API again. Once the stored responses
+    exceed max_bytes, the least recently used ones are deleted.
+
+    Hits don't write to the database: their access times are kept in memory and
+    written in batches (and before any eviction), and the total size is tracked
+    in memory instead of being summed on every store.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            path (str): SQLite database file, created if missing
+            max_bytes (int): Maximum total size of the stored responses
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}
+        self._lock = threading.Lock()
+        # Shared by the threads of an evaluation; every access goes through the lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, model TEXT, content TEXT NOT NULL, '
+                'size INTEGER NOT NULL, last_used REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+        self._total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, request):
+        """
+        Args:
+            request (dict): Keyword arguments for client.chat.completions.create
+
+        Returns:
+            str: The stored response content, or None if the request was never answered
+        """
+        return self.get_key(request_key(request))
+
+    def get_key(self, key):
+        """
+        Args:
+            key (str): Key the response was stored under (see put_key)
+
+        Returns:
+            str: The stored response content, or None
+        """
+        with self._lock:
+            row = self._db.execute('SELECT content FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+            return row[0]
+
+    def put(self, request, content):
+        """
+        Store the response to a request, evicting old responses if over the size limit.
+
+        Args:
+            request (dict): Keyword arguments for client.chat.completions.create
+            content (str): The response content
+        """
+        self.put_key(request_key(request), request.get('model'), content)
+
+    def put_key(self, key, model, content):
+        """
+        Store a response under a key computed earlier with request_key (e.g. a batch custom_id).
+
+        Args:
+            key (str): The request's key
+            model (str): Model name, kept for inspection
+            content (str): The response content
+        """
+        size = len(content.encode('utf-8'))
+        with self._lock, self._db:
+            replaced = self._db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses (key, model, content, size, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, model, content, size, time.time())
+            )
+            self._touched.pop(key, None)
+            self._total += size - (replaced[0] if replaced else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _flush_touched(self):
+        """Write the access times of the hits since the last flush, in one transaction."""
+        if not self._touched:
+            return
+        with self._db:
+            self._db.executemany('UPDATE responses SET last_used = ? WHERE key = ?',
+                                 [(used, key) for key, used in self._touched.items()])
+        self._touched = {}
+
+    def _evict(self):
+        """Delete the least recently used responses until the total size fits max_bytes."""
+        self._flush_touched()
+        # Other processes may share the file: settle the exact total before deleting anything
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        self._total = total
+        if total <= self.max_bytes:
+            return
+        removed = []
+        for key, size in self._db.execute('SELECT key, size FROM responses ORDER BY last_used'):
+            if total <= self.max_bytes:
+                break
+            removed.append((key,))
+            total -= size
+        self._db.executemany('DELETE FROM responses WHERE key = ?', removed)
+        self._total = total
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def clear(self):
+        """Delete every stored response."""
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM responses')
+            self._touched = {}
+            self._total = 0
+
+    def close(self):
+        """Write the pending access times and close the database."""
+        with self._lock:
+            self._flush_touched()
+            self._db.close()
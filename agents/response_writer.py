@@ -0,0 +1,51 @@
+import threading
+
+
+class ResponseWriter:
+    """
+    Writes a responses file, one response per line in question order, while the answers arrive.
+
+    Answers can arrive in any order (concurrent requests, questions grouped by dataset);
+    each one is buffered until every question before it is answered, then the answered
+    prefix is written and flushed. The finished file is the same as Runner.save_responses
+    would write.
+    """
+
+    def __init__(self, path, total):
+        """
+        Args:
+            path (str): Path of the responses file
+            total (int): Number of questions
+        """
+        self.path = path
+        self.total = total
+        self.written = 0
+        self._pending = {}
+        self._file = open(path, 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def add(self, index, response):
+        """
+        Record the response to a question and write every response that is now in order.
+
+        Args:
+            index (int): Index of the question in the test QA file
+            response: The parsed response, written as str(response)
+        """
+        with self._lock:
+            self._pending[index] = response
+            lines = []
+            while self.written in self._pending:
+                lines.append(str(self._pending.pop(self.written)) + "\n")
+                self.written += 1
+            if lines:
+                self._file.write("".join(lines))
+                self._file.flush()
+
+    def close(self):
+        """Close the file; questions left unanswered are not written."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.written < self.total:
+            print(f"Wrote {self.written} of {self.total} responses to {self.path}")
@@ -0,0 +1,194 @@
+import os
+import csv
+import mmap
+import random
+from array import array
+
+from agents.csv_cache import CSVCache
+
+
+def build_row_offsets(buffer):
+    """
+    Find the byte offset at which every CSV record of a buffer starts.
+
+    Newlines inside quoted fields do not end a record, so the number of quote
+    characters seen since the start of the record decides whether a newline counts.
+
+    Args:
+        buffer (bytes or mmap.mmap): The raw CSV content
+
+    Returns:
+        array: Offsets of each record followed by the buffer size, so record i spans offsets[i]:offsets[i + 1]
+    """
+    offsets = array('Q', [0])
+    size = len(buffer)
+    pos = 0
+    quotes = 0
+    while True:
+        newline = buffer.find(b'\n', pos)
+        if newline == -1:
+            break
+        quotes += buffer[pos:newline].count(b'"')
+        pos = newline + 1
+        if quotes % 2 == 0:
+            offsets.append(pos)
+            quotes = 0
+    if offsets[-1] != size:
+        offsets.append(size)
+    return offsets
+
+
+class MappedCSV:
+    """
+    Random access to the rows of a CSV file without parsing the whole file.
+
+    The raw bytes stay in a memory-mapped (or shared) buffer and only the requested
+    rows are parsed. The object behaves like the list of rows DataAgent normally
+    stores: mapped[0] is the header, mapped[i] a row of strings, and iterating yields
+    every row.
+    """
+
+    def __init__(self, buffer, offsets, encoding='utf-8', on_close=None):
+        """
+        Args:
+            buffer (bytes, mmap.mmap or memoryview): The raw CSV content
+            offsets (array): Record offsets as returned by build_row_offsets
+            encoding (str): Text encoding of the CSV content
+            on_close (callable, optional): Called by close() to release the buffer
+        """
+        self.buffer = buffer
+        self.offsets = offsets
+        self.encoding = encoding
+        self.on_close = on_close
+
+    @classmethod
+    def open(cls, csv_path, cache=None, stats=None):
+        """
+        Memory-map a CSV file and load or build its row-offset index.
+
+        The index is persisted next to the file as .<name>.csv.idx and rebuilt only
+        when the CSV changes.
+
+        Args:
+            csv_path (str): Path to the CSV file
+            cache (CSVCache, optional): Sidecar helper used to validate the index
+            stats (dict, optional): Its 'bytes' entry is increased by the bytes read: the
+                index file when it is reused, the whole CSV when the index is built
+
+        Returns:
+            MappedCSV: The mapped file
+        """
+        cache = cache or CSVCache()
+        index_path = cache.sidecar_path(csv_path, 'idx')
+
+        with open(csv_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return cls(b'', array('Q', [0]))
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offsets = None
+        if os.path.exists(index_path) and cache.is_fresh(csv_path, key='index'):
+            offsets = array('Q')
+            with open(index_path, 'rb') as f:
+                offsets.frombytes(f.read())
+            if stats is not None:
+                stats['bytes'] += offsets.itemsize * len(offsets)
+        if not offsets:
+            offsets = build_row_offsets(buffer)
+            if stats is not None:
+                stats['bytes'] += len(buffer)
+            try:
+                signature = cache.signature(csv_path)
+                with open(f'{index_path}.tmp', 'wb') as f:
+                    offsets.tofile(f)
+                os.replace(f'{index_path}.tmp', index_path)
+                cache.write_meta(csv_path, 'index', signature)
+            except OSError as e:
+                print(f"Could not write row index {index_path}: {str(e)}")
+        return cls(buffer, offsets, on_close=buffer.close)
+
+    def parse_row(self, index):
+        """
+        Parse a single record.
+
+        Args:
+            index (int): Record number, 0 being the header
+
+        Returns:
+            list: The row as strings
+        """
+        text = bytes(self.buffer[self.offsets[index]:self.offsets[index + 1]]).decode(self.encoding)
+        # Match the newline translation of files opened in text mode
+        text = text.replace('\r\n', '\n')
+        return next(csv.reader([text]), [])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.parse_row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("row index out of range")
+        return self.parse_row(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.parse_row(index)
+
+    def head(self, n):
+        """
+        Returns:
+            list: The header followed by the first n data rows
+        """
+        return self[:n + 1]
+
+    def take(self, row_ids):
+        """
+        Args:
+            row_ids (list): Data row numbers (0 is the first row after the header)
+
+        Returns:
+            list: The header followed by the requested rows
+        """
+        return [self[0]] + [self[row_id + 1] for row_id in row_ids]
+
+    def sample(self, n, seed=0, stratify=None):
+        """
+        Draw a random sample of data rows, optionally stratified by a column.
+
+        Stratified sampling has to read the stratification column of every row;
+        plain sampling only parses the rows it returns.
+
+        Args:
+            n (int): Number of rows to draw
+            seed (int): Random seed, for reproducible samples
+            stratify (str, optional): Column name to sample proportionally from
+
+        Returns:
+            list: The header followed by the sampled rows, in file order
+        """
+        rng = random.Random(seed)
+        num_rows = len(self) - 1
+        n = min(n, num_rows)
+        if stratify is None:
+            return self.take(sorted(rng.sample(range(num_rows), n)))
+
+        column = self[0].index(stratify)
+        groups = {}
+        for row_id in range(num_rows):
+            row = self[row_id + 1]
+            groups.setdefault(row[column] if column < len(row) else '', []).append(row_id)
+        chosen = []
+        for members in groups.values():
+            share = max(1, round(n * len(members) / num_rows))
+            chosen.extend(rng.sample(members, min(share, len(members))))
+        return self.take(sorted(rng.sample(chosen, min(n, len(chosen)))))
+
+    def close(self):
+        """Release the underlying buffer."""
+        if self.on_close:
+            self.on_close()
+            self.on_close = None
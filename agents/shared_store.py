@@ -0,0 +1,128 @@
+import io
+import csv
+from multiprocessing import shared_memory
+
+from agents.dataAgent import SPLITS
+from agents.row_index import MappedCSV, build_row_offsets
+
+OFFSET_BYTES = 8
+
+
+def open_shared_block(name):
+    """
+    Attach to an existing shared memory block without taking ownership of it.
+
+    The publishing process is responsible for unlinking the block. On Python < 3.13
+    the block is registered with the resource tracker, which worker processes started
+    through multiprocessing share with the publisher, so it is not unlinked early.
+
+    Args:
+        name (str): Name of the shared memory block
+
+    Returns:
+        SharedMemory: The attached block
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedDataStore:
+    """
+    Publishes DataAgent datasets to shared memory so several processes can read them
+    without each holding its own copy.
+
+    Each split is written once as CSV bytes preceded by its row-offset index. Worker
+    processes attach to the blocks by name and get read-only MappedCSV views over
+    the shared buffers, so memory use stays flat as workers are added.
+    """
+
+    def __init__(self):
+        """Initialize a store that owns no shared memory blocks yet."""
+        self.blocks = []
+
+    def publish(self, data):
+        """
+        Copy loaded datasets into shared memory.
+
+        Args:
+            data (dict): Datasets as stored in DataAgent.data
+
+        Returns:
+            dict: A picklable manifest to pass to worker processes for attach()
+        """
+        manifest = {}
+        for folder_name, entry in data.items():
+            manifest[folder_name] = {}
+            for split in SPLITS:
+                if split not in entry:
+                    continue
+                manifest[folder_name][f'{split}_column_names'] = list(entry[f'{split}_column_names'])
+                if f'{split}_profile' in entry:
+                    manifest[folder_name][f'{split}_profile'] = entry[f'{split}_profile']
+
+                output = io.StringIO()
+                csv.writer(output, lineterminator='\n').writerows(entry[split])
+                content = output.getvalue().encode('utf-8')
+                offsets = build_row_offsets(content)
+                offsets_size = len(offsets) * OFFSET_BYTES
+
+                block = shared_memory.SharedMemory(create=True, size=max(1, offsets_size + len(content)))
+                block.buf[:offsets_size] = offsets.tobytes()
+                block.buf[offsets_size:offsets_size + len(content)] = content
+                self.blocks.append(block)
+                manifest[folder_name][split] = {'block': block.name, 'rows': len(offsets), 'size': len(content)}
+        return manifest
+
+    @staticmethod
+    def attach(manifest):
+        """
+        Attach to published datasets from any process.
+
+        Args:
+            manifest (dict): Manifest returned by publish()
+
+        Returns:
+            dict: Datasets in the DataAgent.data layout, with MappedCSV views for the splits
+        """
+        data = {}
+        for folder_name, entry in manifest.items():
+            data[folder_name] = {}
+            for key, value in entry.items():
+                if key.endswith(('_column_names', '_profile')):
+                    data[folder_name][key] = value
+                    continue
+
+                block = open_shared_block(value['block'])
+                offsets_size = value['rows'] * OFFSET_BYTES
+                offsets = block.buf[:offsets_size].cast('Q')
+                buffer = block.buf[offsets_size:offsets_size + value['size']]
+
+                def release(block=block, offsets=offsets, buffer=buffer):
+                    offsets.release()
+                    buffer.release()
+                    block.close()
+
+                data[folder_name][key] = MappedCSV(buffer, offsets, on_close=release)
+        return data
+
+    @staticmethod
+    def detach(data):
+        """
+        Release the views returned by attach().
+
+        Args:
+            data (dict): Datasets returned by attach()
+        """
+        for entry in data.values():
+            for value in entry.values():
+                if isinstance(value, MappedCSV):
+                    value.close()
+
+    def close(self):
+        """Free all published blocks. Call once every worker has detached."""
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
@@ -0,0 +1,409 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextvars
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# USD per million tokens: (input, cached input, output). Update when prices change.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+}
+PHASES = ('render', 'network', 'parse', 'exec')
+PERCENTILES = (50, 95, 99)
+
+# Event of the question being answered in the current thread or asyncio task
+_current_event = contextvars.ContextVar('telemetry_event', default=None)
+
+
+def request_cost(model, prompt_tokens, completion_tokens, cached_tokens=0, prices=None):
+    """
+    Price of a chat completion request.
+
+    Args:
+        model (str): Model name
+        prompt_tokens (int): Prompt tokens, cached ones included
+        completion_tokens (int): Completion tokens
+        cached_tokens (int): Prompt tokens served from the API's prompt cache
+        prices (dict, optional): Prices like MODEL_PRICES (MODEL_PRICES if None)
+
+    Returns:
+        float: Cost in USD, or None for a model without a known price
+    """
+    price = (prices or MODEL_PRICES).get(model)
+    if price is None:
+        return None
+    input_price, cached_price, output_price = price
+    return ((prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+            + completion_tokens * output_price) / 1e6
+
+
+class QuestionEvent:
+    """
+    What answering one question cost: tokens, requests, retries, time per phase and outcome.
+
+    Filled in by LLMClient, the RateLimiter and EvalAgent through the module functions
+    (phase, record_usage, ...) while the event is current.
+    """
+
+    def __init__(self, strategy, dataset, question_index, prices=None):
+        """
+        Args:
+            strategy (str): Name of the model class answering the question
+            dataset (str): Dataset of the question
+            question_index: Index of the question in the test QA file (a list for batched questions)
+            prices (dict, optional): Prices like MODEL_PRICES
+        """
+        self.strategy = strategy
+        self.dataset = dataset
+        self.question_index = question_index
+        self.prices = prices
+        self.model = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.estimated_tokens = False
+        self.requests = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.cost = 0.0
+        self.unpriced = False
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.trimmed_tables = []
+        self.outcome = None
+        self.error = None
+
+    def add_usage(self, model, prompt_tokens, completion_tokens, cached_tokens=0, estimated=False):
+        """Add the tokens of a request sent to the API."""
+        self.model = model
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += cached_tokens
+        self.estimated_tokens = self.estimated_tokens or estimated
+        cost = request_cost(model, prompt_tokens, completion_tokens, cached_tokens, self.prices)
+        if cost is None:
+            self.unpriced = True
+        else:
+            self.cost += cost
+
+    def set_outcome(self, outcome, error=None):
+        """Record an outcome; a question keeps its first outcome other than 'ok'."""
+        if self.outcome in (None, 'ok'):
+            self.outcome = outcome
+            self.error = error
+
+    def to_dict(self, total):
+        """
+        Args:
+            total (float): Wall-clock seconds spent on the question
+
+        Returns:
+            dict: The JSON event
+        """
+        latency = {name: round(seconds, 4) for name, seconds in self.phases.items()}
+        # Whatever the model did outside the other phases: table rendering and prompt building
+        latency['render'] = round(max(0.0, total - sum(self.phases.values())), 4)
+        latency['total'] = round(total, 4)
+        return {
+            'time': round(time.time(), 3),
+            'strategy': self.strategy,
+            'dataset': self.dataset,
+            'question_index': self.question_index,
+            'model': self.model,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cached_tokens': self.cached_tokens,
+            'estimated_tokens': self.estimated_tokens,
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'retries': self.retries,
+            'latency': latency,
+            'cost_usd': None if self.unpriced else round(self.cost, 8),
+            'trimmed_tables': self.trimmed_tables,
+            'outcome': self.outcome or 'ok',
+            'error': self.error,
+        }
+
+
+class Telemetry:
+    """
+    Writes one JSON line per answered question to a file, for EvalAgent(telemetry=...).
+
+    Events are appended and flushed as questions finish, from any thread or asyncio task.
+    summary() / print_summary() aggregate the file by strategy or dataset.
+    """
+
+    def __init__(self, path="telemetry.jsonl", prices=None):
+        """
+        Args:
+            path (str): JSONL file the events are appended to
+            prices (dict, optional): Prices like MODEL_PRICES (MODEL_PRICES if None)
+        """
+        self.path = path
+        self.prices = prices
+        self._file = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def question(self, strategy, dataset, question_index=None):
+        """
+        Make a question's event current while it is answered, then write it.
+
+        Args:
+            strategy (str): Name of the model class answering the question
+            dataset (str): Dataset of the question
+            question_index: Index of the question in the test QA file
+
+        Yields:
+            QuestionEvent: The event
+        """
+        event = QuestionEvent(strategy, dataset, question_index, self.prices)
+        token = _current_event.set(event)
+        start = time.perf_counter()
+        try:
+            yield event
+        except BaseException as e:
+            event.set_outcome('error', f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_event.reset(token)
+            self.write(event.to_dict(time.perf_counter() - start))
+
+    def write(self, event):
+        """Append an event to the file."""
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        """Close the file; it is reopened by the next event."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def summary(self, by='strategy'):
+        """Aggregate the events written so far (see summarize)."""
+        return summarize(read_events(self.path), by)
+
+    def print_summary(self, by=('strategy', 'dataset')):
+        """Print the summary of the events written so far, grouped by each key in turn."""
+        print_summary(read_events(self.path), by)
+
+
+def current_event():
+    """The event of the question being answered, or None outside Telemetry.question()."""
+    return _current_event.get()
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block to a phase of the current event ('network', 'parse' or 'exec')."""
+    event = _current_event.get()
+    if event is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        event.phases[name] += time.perf_counter() - start
+
+
+def record_usage(request, response=None, content=None):
+    """
+    Add the tokens of a request to the current event.
+
+    Args:
+        request (dict): Keyword arguments for client.chat.completions.create
+        response (optional): The API response, whose usage is used when present
+        content (str, optional): The text received, to estimate the tokens of a stream read partially
+    """
+    event = _current_event.get()
+    if event is None:
+        return
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = getattr(details, 'cached_tokens', None) or 0
+        event.add_usage(request.get('model'), usage.prompt_tokens, usage.completion_tokens, cached)
+        return
+    # Imported here: prompt_builder reports to this module
+    from agents.prompt_builder import count_tokens
+
+    # Streams closed early carry no usage: count the tokens sent and received
+    prompt = sum(count_tokens(message.get('content') or '') for message in request.get('messages', []))
+    event.add_usage(request.get('model'), prompt, count_tokens(content or ''), estimated=True)
+
+
+def record_cache_hit(request):
+    """Count a request answered from the ResponseCache in the current event."""
+    event = _current_event.get()
+    if event is not None:
+        event.model = event.model or request.get('model')
+        event.cache_hits += 1
+
+
+def record_trim(report):
+    """
+    Add what PromptBuilder trimmed from a table to fit the token budget to the current event.
+
+    Args:
+        report (dict): Original and final tokens, dropped columns, truncated cells and rows kept
+    """
+    event = _current_event.get()
+    if event is not None:
+        event.trimmed_tables.append(report)
+
+
+def record_retry():
+    """Count a retried request in the current event."""
+    event = _current_event.get()
+    if event is not None:
+        event.retries += 1
+
+
+def record_outcome(response=None, error=None):
+    """
+    Classify a model's raw response in the current event.
+
+    Outcomes are 'ok' (JSON with an answer), 'no_answer' (JSON without one), 'invalid_json',
+    and 'error' (an exception, or the error object CodeBasedModel returns).
+
+    Args:
+        response (str, optional): The model's raw response
+        error (Exception, optional): The exception raised instead of a response
+    """
+    event = _current_event.get()
+    if event is None:
+        return
+    if error is not None:
+        event.set_outcome('error', f"{type(error).__name__}: {error}")
+        return
+    try:
+        parsed = json.loads(response)
+    except (TypeError, json.JSONDecodeError):
+        event.set_outcome('invalid_json')
+        return
+    if isinstance(parsed, dict) and 'answer' in parsed:
+        event.set_outcome('ok')
+    elif isinstance(parsed, dict) and 'error' in parsed:
+        event.set_outcome('error', str(parsed['error']))
+    else:
+        event.set_outcome('no_answer')
+
+
+def read_events(path):
+    """
+    Args:
+        path (str): Telemetry JSONL file
+
+    Returns:
+        list: The events, skipping a partially written last line
+    """
+    events = []
+    if not os.path.exists(path):
+        return events
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return events
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-q * len(ordered) // 100))
+    return ordered[min(len(ordered), rank) - 1]
+
+
+def summarize(events, by='strategy'):
+    """
+    Aggregate events by strategy, dataset or any other event key.
+
+    Args:
+        events (list): Events as written by Telemetry
+        by (str): Event key to group by
+
+    Returns:
+        dict: Group -> questions, outcomes, tokens, retries, cost (total and per question),
+            and p50/p95/p99 latency in seconds of the total and of every phase
+    """
+    groups = {}
+    for event in events:
+        groups.setdefault(str(event.get(by)), []).append(event)
+
+    summary = {}
+    for group, group_events in sorted(groups.items()):
+        questions = sum(len(e['question_index']) if isinstance(e['question_index'], list) else 1
+                        for e in group_events)
+        cost = sum(e['cost_usd'] or 0.0 for e in group_events)
+        outcomes = {}
+        for e in group_events:
+            outcomes[e['outcome']] = outcomes.get(e['outcome'], 0) + 1
+        latency = {}
+        for name in ('total',) + PHASES:
+            values = [e['latency'][name] for e in group_events]
+            latency[name] = {f"p{q}": percentile(values, q) for q in PERCENTILES}
+        summary[group] = {
+            'events': len(group_events),
+            'questions': questions,
+            'outcomes': outcomes,
+            'prompt_tokens': sum(e['prompt_tokens'] for e in group_events),
+            'completion_tokens': sum(e['completion_tokens'] for e in group_events),
+            'cached_tokens': sum(e['cached_tokens'] for e in group_events),
+            'requests': sum(e['requests'] for e in group_events),
+            'cache_hits': sum(e['cache_hits'] for e in group_events),
+            'retries': sum(e['retries'] for e in group_events),
+            'cost_usd': cost,
+            'cost_per_question_usd': cost / questions if questions else 0.0,
+            'unpriced': sum(e['cost_usd'] is None for e in group_events),
+            'latency': latency,
+        }
+    return summary
+
+
+def print_summary(events, by=('strategy', 'dataset')):
+    """
+    Print latency percentiles, tokens and cost, grouped by each key in turn.
+
+    Args:
+        events (list): Events as written by Telemetry
+        by (tuple): Event keys to group by
+    """
+    if isinstance(by, str):
+        by = (by,)
+    for key in by:
+        print(f"\nBy {key}")
+        print(f"{key:<20} {'questions':>9} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'net p95':>7} "
+              f"{'tokens in':>10} {'cached':>8} {'tokens out':>10} {'retries':>7} {'errors':>6} "
+              f"{'cost $':>9} {'$/question':>10}")
+        for group, stats in summarize(events, key).items():
+            total, network = stats['latency']['total'], stats['latency']['network']
+            errors = sum(count for outcome, count in stats['outcomes'].items() if outcome != 'ok')
+            print(f"{group[:20]:<20} {stats['questions']:>9} {total['p50']:>7.2f} {total['p95']:>7.2f} "
+                  f"{total['p99']:>7.2f} {network['p95']:>7.2f} {stats['prompt_tokens']:>10} "
+                  f"{stats['cached_tokens']:>8} {stats['completion_tokens']:>10} {stats['retries']:>7} "
+                  f"{errors:>6} {stats['cost_usd']:>9.4f} {stats['cost_per_question_usd']:>10.6f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a telemetry file written by EvalAgent")
+    parser.add_argument('path', nargs='?', default="telemetry.jsonl", help="Telemetry JSONL file")
+    parser.add_argument('--by', nargs='+', default=['strategy', 'dataset'], help="Event keys to group by")
+    args = parser.parse_args()
+    print_summary(read_events(args.path), args.by)
@@ -2,23 +2,35 @@ import os
 import sys
 import json
 import re
-import csv
+import asyncio
 import pandas as pd
 import numpy as np
 from io import StringIO
-from openai import OpenAI
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from agents.dataAgent import DataAgent  # Import the DataAgent class
+from agents.render_cache import render_csv
+from agents.llm_client import LLMClient
+from agents.telemetry import phase
+from agents.prompt_builder import PromptBuilder, check_prompt_layout, layout_messages
 
 class CodeBasedModel:
-    def __init__(self, api_key=None, competition_directory=None, data=None):
+    def __init__(self, api_key=None, competition_directory=None, data=None, token_budget=None,
+                 prompt_layout="inline", llm=None,
+                 base_url=None):
         """
         Initialize the Code-Based Model with OpenAI API key and data directory.
         
         Args:
             api_key (str, optional): OpenAI API key. Defaults to environment variable.
             competition_directory (str, optional): Path to competition data directory.
+            token_budget (int, optional): Maximum number of tokens for the dataset embedded in the prompt.
+            prompt_layout (str, optional): "inline" puts the question inside the prompt. "prefix" sends the
+                instructions and table first and the question last, so the prefix is identical for every
+                question on a dataset and can be served from the API's prompt cache.
+            llm (LLMClient, optional): Client used to send the requests, e.g. one with a ResponseCache shared
+                between models. A plain client for api_key is created if None.
+            base_url (str, optional): API base URL for that plain client, e.g. a local MockLLMServer.
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.agent = DataAgent()
@@ -27,11 +39,15 @@ class CodeBasedModel:
             self.agent.load_data(self.competition_directory)
         else:
             self.agent.data = data
-        self.client = OpenAI(api_key=self.api_key)
+        check_prompt_layout(prompt_layout)
+        self.prompt_layout = prompt_layout
+        self.prompt_builder = PromptBuilder(token_budget=token_budget, prompt_layout=prompt_layout)
+        self.llm = llm or LLMClient(api_key=self.api_key, base_url=base_url)
+        self.client = self.llm.client
 
-    def query_gpt_code(self, csv_data, column_names, question):
+    def build_messages(self, csv_data, column_names, question):
         """
-        Queries OpenAI's GPT model to generate Python code for answering the question.
+        Build the chat messages for a question in the configured prompt layout.
         
         Args:
             csv_data (str): CSV data as a string.
@@ -39,11 +55,18 @@ class CodeBasedModel:
             question (str): The question to answer.
         
         Returns:
-            str: Generated Python code.
+            list: Chat messages.
         """
+        system = "You are a data analyst answering questions about tabular data."
         # Safely escape CSV data as JSON
         safe_csv_data = json.dumps(csv_data)
         
+        if self.prompt_layout == "prefix":
+            # The question comes in its own message so all questions on a dataset share the same prefix
+            ask = "the answer to the question in the next message."
+        else:
+            ask = f"the answer to the following question:\n        **Question:** {question}"
+        
         prompt = f"""
         You are an AI assistant that generates Python code to answer questions based on a tabular dataset.
         
@@ -59,8 +82,7 @@ class CodeBasedModel:
         The dataset contains the following columns: {', '.join(column_names)}
         
         ### Task:
-        Write a **Python function** called `answer(df)` that computes the answer to the following question:
-        **Question:** {question}
+        Write a **Python function** called `answer(df)` that computes {ask}
         
         The function should return a Python dictionary in the following format:
         ```python
@@ -78,19 +100,19 @@ class CodeBasedModel:
         
         ONLY RETURN THE PYTHON CODE, DO NOT RETURN ANYTHING ELSE.
         """
-        
-        response = self.client.chat.completions.create(
+        return layout_messages(system, prompt, question, self.prompt_layout)
+
+    def build_request(self, csv_data, column_names, question):
+        """
+        Build the chat completion request (keyword arguments for the OpenAI client) for a question.
+        """
+        return dict(
             model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a data analyst answering questions about tabular data."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=self.build_messages(csv_data, column_names, question),
             max_tokens=300,
             temperature=0
         )
-        
-        return response.choices[0].message.content.strip()
-    
+
     def __safe_convert_numeric(self, df):
         """
         Converts only columns that should be numeric, leaving text-based columns unchanged.
@@ -125,14 +147,8 @@ class CodeBasedModel:
         Returns:
             str: CSV content as a string.
         """
-        if dataset_name in self.agent.data and dataset_type in self.agent.data[dataset_name]:
-            data_list = self.agent.data[dataset_name][dataset_type]  # list of lists
-            output = StringIO()
-            writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
-            writer.writerows(data_list)
-            return output.getvalue().strip()
-        else:
-            raise FileNotFoundError(f"Dataset {dataset_name}/{dataset_type}.csv not found.")
+        # Rendered once per dataset and shared with the other models
+        return render_csv(self.agent.data, dataset_name, dataset_type, fmt='csv')
     
     def execute_generated_code(self, code, df):
         """
@@ -205,17 +221,45 @@ class CodeBasedModel:
             dataset_type (str, optional): Either 'sample' or 'all'.
         
         Returns:
-            str: A JSON string with the result or error.
+            str: A JSON string with the result or error. Request errors (and DeferredRequest)
+            are raised, so that failed requests are not recorded as answers.
         """
         try:
-            csv_data = self.get_csv_data(dataset_name, dataset_type)
-            # Use on_bad_lines="skip" for compatibility with pandas 1.3+
-            df = pd.read_csv(StringIO(csv_data), on_bad_lines="skip")
-            column_names = df.columns.tolist()
-            generated_code = self.query_gpt_code(csv_data, column_names, question)
+            df, request = self.prepare_question(dataset_name, question, dataset_type)
+        except Exception as e:
+            return json.dumps({"error": f"Error loading CSV: {str(e)}"}, indent=4)
+        generated_code = self.llm.complete(**request)
+        with phase('exec'):
             return self.execute_generated_code(generated_code, df)
+
+    async def ask_question_async(self, dataset_name, question, dataset_type="sample"):
+        """
+        Same as ask_question, awaiting the model call so that many questions can be in flight at once.
+        The generated code runs in a worker thread to keep the event loop free.
+        """
+        try:
+            df, request = self.prepare_question(dataset_name, question, dataset_type)
         except Exception as e:
             return json.dumps({"error": f"Error loading CSV: {str(e)}"}, indent=4)
+        generated_code = await self.llm.acomplete(**request)
+        with phase('exec'):
+            return await asyncio.to_thread(self.execute_generated_code, generated_code, df)
+
+    def prepare_question(self, dataset_name, question, dataset_type="sample"):
+        """
+        Load a dataset as a DataFrame and build the code generation request for a question.
+
+        Returns:
+            tuple: (DataFrame, request keyword arguments)
+        """
+        csv_data = self.get_csv_data(dataset_name, dataset_type)
+        prompt_data = self.prompt_builder.table(self.agent.data, dataset_name, dataset_type, question, fmt='csv')
+        # Always parsed by read_csv, even for columnar datasets: the generated code relies on
+        # its dtype inference (booleans, exponents, NA strings), which ColumnarTable doesn't mimic.
+        # Use on_bad_lines="skip" for compatibility with pandas 1.3+
+        df = pd.read_csv(StringIO(csv_data), on_bad_lines="skip")
+        column_names = df.columns.tolist()
+        return df, self.build_request(prompt_data, column_names, question)
 
 # Example usage
 if __name__ == "__main__":
@@ -1,17 +1,30 @@
 import os
-from openai import OpenAI
 import sys 
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..')) 
+from agents.render_cache import render_csv
+from agents.llm_client import LLMClient
+from agents.prompt_builder import PromptBuilder, check_prompt_layout, layout_messages, schema_text
 
 class CoTPromptingModel:
-    def __init__(self, api_key=None, competition_directory=None, data=None):
+    def __init__(self, api_key=None, competition_directory=None, data=None, token_budget=None,
+                 prompt_layout="inline", llm=None,
+                 base_url=None, stream_answer=False):
         """
         Initialize the Chain of Thought Prompting Model with OpenAI API key and data directory.
         
         Args:
             api_key (str, optional): OpenAI API key. Defaults to environment variable.
             competition_directory (str, optional): Path to competition data directory.
+            token_budget (int, optional): Maximum number of tokens for the dataset embedded in the prompt.
+            prompt_layout (str, optional): "inline" puts the question inside the prompt. "prefix" sends the
+                instructions and table first and the question last, so the prefix is identical for every
+                question on a dataset and can be served from the API's prompt cache.
+            llm (LLMClient, optional): Client used to send the requests, e.g. one with a ResponseCache shared
+                between models. A plain client for api_key is created if None.
+            base_url (str, optional): API base URL for that plain client, e.g. a local MockLLMServer.
+            stream_answer (bool, optional): Stream responses and stop reading once the answer is complete,
+                without waiting for columns_used and explanation (responses then only contain the answer).
         """
         # Set up API key
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
@@ -24,7 +37,8 @@ class CoTPromptingModel:
             )
 
         # Initialize OpenAI client with the API key
-        self.client = OpenAI(api_key=self.api_key)
+        self.llm = llm or LLMClient(api_key=self.api_key, base_url=base_url)
+        self.client = self.llm.client
 
         # Set up DataAgent
         from agents.dataAgent import DataAgent  # Import the DataAgent class
@@ -34,50 +48,84 @@ class CoTPromptingModel:
             self.agent.load_data(self.competition_directory)
         else:
             self.agent.data = data
+        check_prompt_layout(prompt_layout)
+        self.prompt_layout = prompt_layout
+        self.prompt_builder = PromptBuilder(token_budget=token_budget, prompt_layout=prompt_layout)
+        self.stream_answer = stream_answer
+        self.relevant_columns_cache = {}  # (dataset, split, question) -> columns from step 1
 
-    def identify_relevant_columns(self, csv_data, question):
+    def build_column_messages(self, schema, question):
         """
-        Step 1: Queries GPT-3.5 to determine which columns in the dataset are relevant for answering the question.
+        Build the chat messages for step 1 in the configured prompt layout.
         """
+        system = "You are a data analyst identifying important columns in a dataset."
+        if self.prompt_layout == "prefix":
+            # The question comes in its own message so all questions on a dataset share the same prefix
+            ask = "Identify the column names that are necessary to answer the question in the next message."
+        else:
+            ask = f'Identify the column names that are necessary to answer this question:\n        "{question}"'
         prompt = f"""
         You are analyzing a dataset and determining which columns are most relevant for answering a question.
 
-        Here is the dataset:
+        Here is the dataset schema:
         ```
-        {csv_data}
+        {schema}
         ```
 
-        Identify the column names that are necessary to answer this question:
-        "{question}"
+        {ask}
 
         Respond with a list of column names in JSON format:
         {{
             "columns_used": ["<column1>", "<column2>", ...]
         }}
         """
+        return layout_messages(system, prompt, question, self.prompt_layout)
 
-        response = self.client.chat.completions.create(
+    def build_column_request(self, schema, question):
+        """
+        Build the chat completion request (keyword arguments for the OpenAI client) for step 1.
+        """
+        return dict(
             model="gpt-3.5-turbo",  # Use "gpt-4" if available
-            messages=[
-                {"role": "system", "content": "You are a data analyst identifying important columns in a dataset."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=self.build_column_messages(schema, question),
             max_tokens=150,
             temperature=0
         )
 
-        # Extract columns from response (expects JSON format)
+    def parse_relevant_columns(self, content):
+        """
+        Extract the column list from the step 1 response (expects JSON format).
+        """
         import json
         try:
-            columns_info = json.loads(response.choices[0].message.content.strip())
+            columns_info = json.loads(content)
             return columns_info.get("columns_used", [])
         except json.JSONDecodeError:
             return []
 
-    def query_gpt_chain_of_thought(self, csv_data, relevant_columns, question):
+    def identify_relevant_columns(self, schema, question):
         """
-        Step 2 & 3: Queries GPT-3.5 with Chain of Thought reasoning to systematically answer the question.
+        Step 1: Queries GPT-3.5 to determine which columns in the dataset are relevant for answering the question.
+
+        Only a compact schema (column types, value summaries and a few rows) is sent, not the whole table.
         """
+        return self.parse_relevant_columns(self.llm.complete(**self.build_column_request(schema, question)))
+
+    def build_messages(self, csv_data, relevant_columns, question):
+        """
+        Build the chat messages for steps 2 & 3 in the configured prompt layout.
+        """
+        system = "You are a data analyst reasoning through tabular data."
+        columns = f"The most relevant columns for answering the question are: {', '.join(relevant_columns)}."
+        if self.prompt_layout == "prefix":
+            # The columns and the question come in their own message so all questions on a dataset
+            # share the same prefix
+            question_message = f"{columns}\nQuestion: {question}"
+            columns = "The next message gives the most relevant columns for answering a question, and the question."
+            ask = "Now, answer the question in the next message."
+        else:
+            question_message = question
+            ask = f'Now, answer the question:\n        "{question}"'
         prompt = f"""
         You are an AI answering questions based on tabular data.
 
@@ -86,14 +134,13 @@ class CoTPromptingModel:
         {csv_data}
         ```
 
-        The most relevant columns for answering the question are: {', '.join(relevant_columns)}.
+        {columns}
 
         Step 1: First, analyze the values in these columns and explain how they can be used to answer the question.
 
         Step 2: Based on this analysis, derive the final answer.
 
-        Now, answer the question:
-        "{question}"
+        {ask}
         Make sure the answer you provide is simple and either of the following data-type:
         - String
         - Integer
@@ -109,19 +156,19 @@ class CoTPromptingModel:
             "explanation": "<brief reasoning>"
         }}
         """
+        return layout_messages(system, prompt, question_message, self.prompt_layout)
 
-        response = self.client.chat.completions.create(
+    def build_request(self, csv_data, relevant_columns, question):
+        """
+        Build the chat completion request (keyword arguments for the OpenAI client) for a question.
+        """
+        return dict(
             model="gpt-3.5-turbo",  
-            messages=[
-                {"role": "system", "content": "You are a data analyst reasoning through tabular data."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=self.build_messages(csv_data, relevant_columns, question),
             max_tokens=250,
             temperature=0
         )
 
-        return response.choices[0].message.content.strip()
-
     def get_csv_data(self, dataset_name, dataset_type="sample"):
         """
         Retrieve CSV data as a string using DataAgent.
@@ -133,11 +180,8 @@ class CoTPromptingModel:
         Returns:
             str: CSV content as a string.
         """
-        if dataset_name in self.agent.data and dataset_type in self.agent.data[dataset_name]:
-            csv_data = self.agent.data[dataset_name][dataset_type]  # Retrieve data list
-            return "\n".join([",".join(row) for row in csv_data])  # Convert to CSV string
-        else:
-            raise FileNotFoundError(f"Dataset {dataset_name}/{dataset_type}.csv not found.")
+        # Rendered once per dataset and shared with the other models
+        return render_csv(self.agent.data, dataset_name, dataset_type)
 
     def ask_question(self, dataset_name, question, dataset_type="sample"):
         """
@@ -151,15 +195,44 @@ class CoTPromptingModel:
         Returns:
             str: The model's response.
         """
-        # Load dataset as a string
-        csv_data = self.get_csv_data(dataset_name, dataset_type)
+        # Step 1: Identify relevant columns from the schema, once per question
+        key = (dataset_name, dataset_type, question)
+        if key not in self.relevant_columns_cache:
+            schema = schema_text(self.agent.data, dataset_name, dataset_type)
+            self.relevant_columns_cache[key] = self.identify_relevant_columns(schema, question)
 
-        # Step 1: Identify relevant columns
-        relevant_columns = self.identify_relevant_columns(csv_data, question)
+        # Step 2 & 3: Use CoT prompting to answer the question
+        request = self.build_answer_request(dataset_name, question, dataset_type)
+        return self.llm.answer_method(self.stream_answer)(**request)
+
+    async def ask_question_async(self, dataset_name, question, dataset_type="sample"):
+        """
+        Same as ask_question, awaiting both model calls so that many questions can be in flight at once.
+        """
+        key = (dataset_name, dataset_type, question)
+        if key not in self.relevant_columns_cache:
+            schema = schema_text(self.agent.data, dataset_name, dataset_type)
+            content = await self.llm.acomplete(**self.build_column_request(schema, question))
+            self.relevant_columns_cache[key] = self.parse_relevant_columns(content)
+
+        request = self.build_answer_request(dataset_name, question, dataset_type)
+        return await self.llm.answer_method(self.stream_answer, asynchronous=True)(**request)
+
+    def build_answer_request(self, dataset_name, question, dataset_type="sample"):
+        """
+        Build the step 2 request from the relevant columns identified in step 1.
+        """
+        relevant_columns = self.relevant_columns_cache[(dataset_name, dataset_type, question)]
         print(f"Identified Relevant Columns: {relevant_columns}")
 
-        # Step 2 & 3: Use CoT prompting to answer the question
-        return self.query_gpt_chain_of_thought(csv_data, relevant_columns, question)
+        # Only send the selected columns, or the whole table if none of them exist.
+        # The prefix layout always sends the whole table so that it stays cacheable.
+        column_names = self.agent.data[dataset_name][f'{dataset_type}_column_names']
+        selected = [name for name in relevant_columns if name in column_names]
+        if self.prompt_layout == "prefix":
+            selected = []
+        csv_data = self.prompt_builder.table(self.agent.data, dataset_name, dataset_type, question, columns=selected)
+        return self.build_request(csv_data, selected or relevant_columns, question)
 
 
 # Example usage
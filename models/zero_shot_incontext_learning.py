@@ -1,24 +1,38 @@
 import os
-from openai import OpenAI
 import json  # Ensure json module is imported
 
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))  # Add the parent directory to the system path
 
 from agents.dataAgent import DataAgent  # Import the DataAgent class
+from agents.render_cache import render_csv
+from agents.llm_client import LLMClient
+from agents.question_batch import ask_questions_batched, batch_request
+from agents.prompt_builder import PromptBuilder, check_prompt_layout, layout_messages
 from dotenv import load_dotenv
 load_dotenv()  # Load environment variables from .env file
 
 api_key = os.getenv("OPENAI_API_KEY")
 
 class ZeroShotModelICL:
-    def __init__(self, api_key=None, competition_directory=None, data=None):
+    def __init__(self, api_key=None, competition_directory=None, data=None, token_budget=None,
+                 prompt_layout="inline", llm=None,
+                 base_url=None, stream_answer=False):
         """
         Initialize the ZeroShotModel with OpenAI API key and data directory.
         
         Args:
             api_key (str, optional): OpenAI API key. Defaults to environment variable.
             competition_directory (str, optional): Path to competition data directory.
+            token_budget (int, optional): Maximum number of tokens for the dataset embedded in the prompt.
+            prompt_layout (str, optional): "inline" puts the question inside the prompt. "prefix" sends the
+                instructions and table first and the question last, so the prefix is identical for every
+                question on a dataset and can be served from the API's prompt cache.
+            llm (LLMClient, optional): Client used to send the requests, e.g. one with a ResponseCache shared
+                between models. A plain client for api_key is created if None.
+            base_url (str, optional): API base URL for that plain client, e.g. a local MockLLMServer.
+            stream_answer (bool, optional): Stream responses and stop reading once the answer is complete,
+                without waiting for columns_used and explanation (responses then only contain the answer).
         """
         # Set up API key
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
@@ -39,12 +53,23 @@ class ZeroShotModelICL:
             self.agent.load_data(self.competition_directory)
         else:
             self.agent.data = data
-        self.client = OpenAI(api_key=self.api_key)
-
-    def query_gpt_icl(self, csv_data, question):
+        check_prompt_layout(prompt_layout)
+        self.prompt_layout = prompt_layout
+        self.prompt_builder = PromptBuilder(token_budget=token_budget, prompt_layout=prompt_layout)
+        self.stream_answer = stream_answer
+        self.llm = llm or LLMClient(api_key=self.api_key, base_url=base_url)
+        self.client = self.llm.client
+
+    def build_messages(self, csv_data, question):
         """
-        Queries OpenAI's GPT model using the given tabular data and question.
+        Build the chat messages for a question in the configured prompt layout.
         """
+        system = "You are a data analyst answering questions about tabular data."
+        if self.prompt_layout == "prefix":
+            # The question comes in its own message so all questions on a dataset share the same prefix
+            ask = "Please answer the question in the next message in JSON format."
+        else:
+            ask = f"Please answer the following question in JSON format:\n        Question: {question}"
         prompt = f"""
         You are an AI answering questions based on tabular data.
 
@@ -52,8 +77,7 @@ class ZeroShotModelICL:
         ```
         {csv_data}
         ```
-        Please answer the following question in JSON format:
-        Question: {question}
+        {ask}
 
         Example response:
         {{
@@ -62,18 +86,25 @@ class ZeroShotModelICL:
             "explanation": "<brief reasoning>"
         }}
         """
+        return layout_messages(system, prompt, question, self.prompt_layout)
 
-        response = self.client.chat.completions.create(
+    def build_request(self, csv_data, question):
+        """
+        Build the chat completion request (keyword arguments for the OpenAI client) for a question.
+        """
+        return dict(
             model="gpt-3.5-turbo",  # Use "gpt-4" if available
-            messages=[
-                {"role": "system", "content": "You are a data analyst answering questions about tabular data."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=self.build_messages(csv_data, question),
             max_tokens=150,
             temperature=0
         )
 
-        return response.choices[0].message.content.strip()
+    def query_gpt_icl(self, csv_data, question):
+        """
+        Queries OpenAI's GPT model using the given tabular data and question.
+        """
+        request = self.build_request(csv_data, question)
+        return self.llm.answer_method(self.stream_answer)(**request)
 
     def get_csv_data(self, dataset_name, dataset_type="sample"):
         """
@@ -86,11 +117,8 @@ class ZeroShotModelICL:
         Returns:
             str: CSV content as a string.
         """
-        if dataset_name in self.agent.data and dataset_type in self.agent.data[dataset_name]:
-            csv_data = self.agent.data[dataset_name][dataset_type]  # Retrieve data list
-            return "\n".join([",".join(row) for row in csv_data])  # Convert to CSV string
-        else:
-            raise FileNotFoundError(f"Dataset {dataset_name}/{dataset_type}.csv not found.")
+        # Rendered once per dataset and shared with the other models
+        return render_csv(self.agent.data, dataset_name, dataset_type)
 
     def ask_question(self, dataset_name, question, dataset_type="sample"):
         """
@@ -104,9 +132,39 @@ class ZeroShotModelICL:
         Returns:
             str: The model's response.
         """
-        csv_data = self.get_csv_data(dataset_name, dataset_type)
+        csv_data = self.prompt_builder.table(self.agent.data, dataset_name, dataset_type, question)
         return self.query_gpt_icl(csv_data, question)
 
+    async def ask_question_async(self, dataset_name, question, dataset_type="sample"):
+        """
+        Same as ask_question, awaiting the model call so that many questions can be in flight at once.
+        """
+        csv_data = self.prompt_builder.table(self.agent.data, dataset_name, dataset_type, question)
+        request = self.build_request(csv_data, question)
+        return await self.llm.answer_method(self.stream_answer, asynchronous=True)(**request)
+
+    def build_batch_request(self, csv_data, questions):
+        """
+        Build the chat completion request asking several questions at once (see ask_questions).
+        """
+        return batch_request("gpt-3.5-turbo", csv_data, questions, self.prompt_layout)
+
+    def ask_questions(self, dataset_name, questions, dataset_type="sample"):
+        """
+        Ask several questions about a dataset in one call, sending the table once.
+
+        Falls back to ask_question for each question if the answers can't be parsed.
+
+        Args:
+            dataset_name (str): The competition dataset folder name.
+            questions (list): The questions to ask about the dataset.
+            dataset_type (str): Either 'sample' or 'all' (default: 'sample').
+
+        Returns:
+            list: The model's response to each question.
+        """
+        return ask_questions_batched(self, dataset_name, questions, dataset_type)
+
 
 # Example usage
 if __name__ == "__main__":